@@ -0,0 +1,141 @@
+"""
+Benchmark the handlers of the Crowdsource Hinter against synthetic hint
+databases.
+
+Each handler call loads a fresh block from a key-value store holding the
+fields as JSON, runs the handler and saves the fields back, which is the
+work the LMS does for every request. For each database size and ratio of
+reported hints, the latency percentiles of get_hint, rate_hint,
+add_new_hint (which evicts hints once an answer has hint_limit of them)
+and get_used_hint_answer_data are printed, followed by the serialized
+size of the fields.
+
+Run it from the root of the repository, e.g.:
+
+    python -m benchmarks.bench_handlers --sizes 100 10000 --backend sqlite
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+from .runtime import JsonKeyValueStore, call_handler, make_block, percentile, timed
+
+HANDLERS = ("get_hint", "get_used_hint_answer_data", "rate_hint", "add_new_hint")
+
+# The fields whose serialized size is reported.
+SIZE_FIELDS = ("hint_database", "reported_hints", "unhinted_answers")
+
+
+def answer_text(index):
+    return u"answer {}".format(index)
+
+
+def hint_text(answer_index, hint_index):
+    return u"Hint {} for answer {}: check the sign of the second term.".format(hint_index, answer_index)
+
+
+def populate(kvs, settings, entries, hints_per_answer, reported_ratio, rng):
+    """
+    Fill a key-value store with a hint database of about entries hints,
+    hints_per_answer per incorrect answer, of which reported_ratio are
+    reported and about a tenth have been voted on.
+
+    Returns:
+      the number of incorrect answers with hints
+    """
+    answer_count = max(1, entries // hints_per_answer)
+    block = make_block(kvs, "author", settings, staff=True)
+    block.hint_limit = hints_per_answer
+    store = block.hint_store
+    store.seed(dict((answer_text(i), [hint_text(i, j) for j in range(hints_per_answer)])
+                    for i in range(answer_count)),
+               block.current_initial_hints_version())
+    for _ in range(entries // 10):
+        i = rng.randrange(answer_count)
+        store.vote(answer_text(i), hint_text(i, rng.randrange(hints_per_answer)),
+                   rng.choice(("upvotes", "upvotes", "downvotes")))
+    for i in range(answer_count):
+        for j in range(hints_per_answer):
+            if rng.random() < reported_ratio:
+                store.report(answer_text(i), hint_text(i, j))
+    block.save()
+    return answer_count
+
+
+def run_iteration(kvs, settings, answer_count, hints_per_answer, iteration, rng, timings):
+    """
+    Time one call of every handler, as a new student.
+    """
+    user = "student {}".format(iteration)
+    i = rng.randrange(answer_count)
+    # one submission in ten is an answer that has no hints
+    submitted = answer_text(i) if rng.random() < 0.9 else u"unhinted {}".format(rng.randrange(answer_count))
+
+    def call(handler_name, data, staff=False):
+        block = make_block(kvs, user, settings, staff=staff)
+        _, elapsed = timed(call_handler, block, handler_name, data)
+        timings[handler_name].append(elapsed)
+
+    call("get_hint", {"submittedanswer": u"input_1=" + submitted})
+    call("get_used_hint_answer_data", {})
+    call("rate_hint", {"student_answer": answer_text(i),
+                       "hint": hint_text(i, rng.randrange(hints_per_answer)),
+                       "student_rating": rng.choice(("upvote", "downvote"))})
+    call("add_new_hint", {"answer": answer_text(i),
+                          "new_hint_submission": u"New hint {} for answer {}".format(iteration, i)})
+
+
+def report(size, reported_ratio, timings, sizes):
+    print(u"entries={} reported={:.0%}".format(size, reported_ratio))
+    print(u"  {:<28}{:>10}{:>10}{:>10}{:>10}".format("handler (ms)", "p50", "p90", "p99", "max"))
+    for handler_name in HANDLERS:
+        values = sorted(timings[handler_name])
+        print(u"  {:<28}{:>10.3f}{:>10.3f}{:>10.3f}{:>10.3f}".format(
+            handler_name, *[1000 * percentile(values, fraction) for fraction in (0.5, 0.9, 0.99, 1.0)]))
+    print(u"  {:<28}{:>10}".format("field", "bytes"))
+    for name, byte_count in sizes:
+        print(u"  {:<28}{:>10}".format(name, byte_count))
+
+
+def benchmark(size, reported_ratio, args):
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="crowdsourcehinter-bench-")
+    try:
+        settings = {}
+        if args.backend == "sqlite":
+            settings = {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": os.path.join(directory, "hints.db")}
+        kvs = JsonKeyValueStore({})
+        answer_count = populate(kvs, settings, size, args.hints_per_answer, reported_ratio, rng)
+        timings = dict((handler_name, []) for handler_name in HANDLERS)
+        for iteration in range(args.iterations):
+            run_iteration(kvs, settings, answer_count, args.hints_per_answer, iteration, rng, timings)
+        field_sizes = kvs.field_sizes()
+        sizes = [(name, field_sizes.get(name, 0)) for name in SIZE_FIELDS]
+        if args.backend == "sqlite":
+            sizes.append(("sqlite file", os.path.getsize(settings["SQLITE_PATH"])))
+        report(size, reported_ratio, timings, sizes)
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000],
+                        help="numbers of hints in the synthetic databases (up to 1000000)")
+    parser.add_argument("--reported-ratios", type=float, nargs="+", default=[0.0, 0.1],
+                        help="fractions of the hints that are reported")
+    parser.add_argument("--backend", choices=("fields", "sqlite"), default="fields")
+    parser.add_argument("--hints-per-answer", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=20,
+                        help="calls of each handler per database")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for size in args.sizes:
+        for reported_ratio in args.reported_ratios:
+            benchmark(size, reported_ratio, args)
+
+
+if __name__ == "__main__":
+    main()
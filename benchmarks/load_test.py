@@ -0,0 +1,334 @@
+"""
+Load test the Crowdsource Hinter with concurrent cohorts of simulated
+students.
+
+The hinter is loaded from its workbench scenario (the Michigan text input
+problem). Each simulated student submits one to three incorrect answers
+and gets a hint for each, answers correctly, fetches the hint to rate
+(get_used_hint_answer_data), rates it, and may contribute a hint of their
+own. Every handler call loads the block from a shared in-memory key-value
+store and saves its fields back, as the LMS does for every request, with
+a simulated round trip to the store, so requests that overlap can
+overwrite each other's changes to the fields shared by all students.
+
+Students run either in a pool of threads (--model threads), each thread
+taking the next student when one finishes, or as asyncio tasks (--model
+asyncio) that all start at once, think between requests and send their
+handler calls to a pool of workers. Either way, --concurrency bounds the
+number of requests in flight; each level given is a separate run.
+
+For each run, the throughput, the latency percentiles of each handler,
+the writes and bytes written per field, and the lost updates are printed:
+hints and votes the handlers reported as saved that are missing from the
+hint database at the end.
+
+Run it from the root of the repository, e.g.:
+
+    python -m benchmarks.load_test --students 500 --concurrency 1 8 32 --model asyncio
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+import six
+
+from crowdsourcehinter import CrowdsourceHinter
+
+from .runtime import BenchmarkRuntime, JsonKeyValueStore, call_handler, make_block, percentile, timed
+
+HANDLERS = ("get_hint", "get_used_hint_answer_data", "rate_hint", "add_new_hint")
+
+USAGE_ID = "hinter"
+
+# The incorrect answers of the simulated students: those of the
+# scenario's initial hints, and others. The correct answer is graded by
+# the problem, which the hinter never sees.
+HINTED_ANSWERS = (u"michiganp", u"michigann")
+OTHER_ANSWERS = (u"michgan", u"mishigan", u"michigan state", u"wisconsin", u"lansing", u"great lakes")
+
+# Words of the hints contributed by students, drawn at random so that
+# they are rarely near duplicates of each other.
+HINT_WORDS = (u"check", u"spelling", u"state", u"name", u"letters", u"double", u"final", u"capital",
+              u"lake", u"north", u"mitten", u"peninsula", u"vowel", u"extra", u"missing", u"remove",
+              u"look", u"again", u"carefully", u"map", u"border", u"east", u"west", u"count")
+
+
+class LoadTestKeyValueStore(JsonKeyValueStore):
+    """
+    A JsonKeyValueStore that waits latency seconds for every read and
+    write, like a round trip to the database of the LMS, and counts the
+    writes and bytes written per field.
+    """
+
+    def __init__(self, latency=0.0):
+        super(LoadTestKeyValueStore, self).__init__({})
+        self.latency = latency
+        self.writes = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        if self.latency:
+            time.sleep(self.latency)
+        return super(LoadTestKeyValueStore, self).get(key)
+
+    def set(self, key, value):
+        super(LoadTestKeyValueStore, self).set(key, value)
+        with self.lock:
+            writes, byte_count = self.writes.get(key.field_name, (0, 0))
+            self.writes[key.field_name] = (writes + 1, byte_count + len(self.db_dict[key].encode("utf8")))
+
+    def set_many(self, update_dict):
+        if self.latency:
+            time.sleep(self.latency)
+        super(LoadTestKeyValueStore, self).set_many(update_dict)
+
+
+class LoadTestResults(object):
+    """
+    What the simulated students did and saw, shared by all of them.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = dict((handler_name, []) for handler_name in HANDLERS)
+        # the failed calls of each handler, as a list of error messages
+        self.errors = dict((handler_name, []) for handler_name in HANDLERS)
+        # the hints add_new_hint reported as added, as (answer, hint)
+        self.added_hints = set()
+        # the votes the handlers reported as counted, by (answer, hint)
+        self.votes = {}
+
+    def record_call(self, handler_name, elapsed):
+        with self.lock:
+            self.timings[handler_name].append(elapsed)
+
+    def record_error(self, handler_name, error):
+        with self.lock:
+            self.errors[handler_name].append(u"{}: {}".format(type(error).__name__, error))
+
+    def record_vote(self, answer, hint):
+        with self.lock:
+            self.votes[(answer, hint)] = self.votes.get((answer, hint), 0) + 1
+
+    def record_added_hint(self, answer, hint):
+        with self.lock:
+            self.added_hints.add((answer, hint))
+
+
+def scenario_block(kvs, settings, hint_limit):
+    """
+    Create the hinter of the workbench scenario in a key-value store.
+    """
+    scenario = CrowdsourceHinter.workbench_scenarios()[0][1]
+    node = ElementTree.fromstring(scenario).find("crowdsourcehinter")
+    runtime = BenchmarkRuntime(kvs, settings)
+    block = CrowdsourceHinter.parse_xml(node, runtime, make_block(kvs, usage_id=USAGE_ID).scope_ids, None)
+    block.hint_limit = hint_limit
+    block.save()
+
+
+def student_flow(student, rng):
+    """
+    The requests of one simulated student, as a generator of
+    (handler name, data) that is sent the response of each request.
+    """
+    wrong_answers = [rng.choice(HINTED_ANSWERS) if rng.random() < 0.6 else rng.choice(OTHER_ANSWERS)
+                     for _ in range(rng.randint(1, 3))]
+    for answer in wrong_answers:
+        submitted = six.moves.urllib.parse.quote_plus(answer.encode("utf8"))
+        yield "get_hint", {"submittedanswer": u"input_1=" + submitted}
+    used = yield "get_used_hint_answer_data", {}
+    for hint, answer in used.items():
+        if hint != "null" and rng.random() < 0.8:
+            rating = "upvote" if rng.random() < 0.7 else "downvote"
+            response = yield "rate_hint", {"student_answer": answer, "hint": hint, "student_rating": rating}
+            if response.get("success"):
+                yield "vote", (answer, hint)
+    if rng.random() < 0.3:
+        answer = wrong_answers[0]
+        hint = u" ".join(rng.choice(HINT_WORDS) for _ in range(6)) + u" ({})".format(student)
+        response = yield "add_new_hint", {"answer": answer, "new_hint_submission": hint}
+        if response.get("upvoted"):
+            # counted as an upvote of a hint very much like it
+            yield "vote", (answer, response["hint"])
+        elif "hint" not in response and response.get("success"):
+            yield "added", (answer, hint)
+
+
+def call(kvs, settings, student, handler_name, data, results):
+    """
+    Send one request of a student, as a fresh load of the block.
+
+    Returns:
+      the decoded response, or None if the handler failed
+    """
+    block = make_block(kvs, u"student {}".format(student), settings, usage_id=USAGE_ID)
+    try:
+        response, elapsed = timed(call_handler, block, handler_name, data)
+    except Exception as error:  # pylint: disable=broad-except
+        results.record_error(handler_name, error)
+        return None
+    results.record_call(handler_name, elapsed)
+    return response
+
+
+def advance(flow, response, results):
+    """
+    Send a response to a student's flow and return its next request, or
+    None when the student is done. Records of what the student saw are
+    taken along the way.
+    """
+    try:
+        step = flow.send(response)
+        while step[0] in ("vote", "added"):
+            if step[0] == "vote":
+                results.record_vote(*step[1])
+            else:
+                results.record_added_hint(*step[1])
+            step = flow.send(None)
+        return step
+    except StopIteration:
+        return None
+
+
+def think(rng, think_time):
+    return rng.uniform(0, think_time) if think_time else 0
+
+
+def run_threads(kvs, settings, args, concurrency, results):
+    """
+    Run the students in a pool of concurrency threads.
+    """
+    def run_student(student):
+        rng = random.Random(args.seed * 1000003 + student)
+        flow = student_flow(student, rng)
+        step = advance(flow, None, results)
+        while step is not None:
+            response = call(kvs, settings, student, step[0], step[1], results)
+            if response is None:
+                return
+            time.sleep(think(rng, args.think_time))
+            step = advance(flow, response, results)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(run_student, range(args.students)))
+
+
+def run_asyncio(kvs, settings, args, concurrency, results):
+    """
+    Run the students as asyncio tasks sending their requests to a pool
+    of concurrency workers.
+    """
+    loop = asyncio.new_event_loop()
+    executor = ThreadPoolExecutor(concurrency)
+
+    async def run_student(student):
+        rng = random.Random(args.seed * 1000003 + student)
+        flow = student_flow(student, rng)
+        step = advance(flow, None, results)
+        while step is not None:
+            response = await loop.run_in_executor(executor, call, kvs, settings, student, step[0], step[1],
+                                                  results)
+            if response is None:
+                return
+            await asyncio.sleep(think(rng, args.think_time))
+            step = advance(flow, response, results)
+
+    async def run_students():
+        await asyncio.gather(*[run_student(student) for student in range(args.students)])
+
+    try:
+        loop.run_until_complete(run_students())
+    finally:
+        executor.shutdown()
+        loop.close()
+
+
+def lost_updates(kvs, settings, results):
+    """
+    Compare the hints and votes the handlers reported as saved with the
+    hint database.
+
+    Returns:
+      (hints lost, votes lost)
+    """
+    store = make_block(kvs, "author", settings, usage_id=USAGE_ID).hint_store
+    lost_hints = sum(1 for answer, hint in results.added_hints if not store.has_hint(answer, hint))
+    lost_votes = 0
+    for (answer, hint), votes in results.votes.items():
+        if store.has_hint(answer, hint):
+            rating = store.rating(answer, hint)
+            lost_votes += max(0, votes - rating["upvotes"] - rating["downvotes"])
+        else:
+            lost_votes += votes
+    return lost_hints, lost_votes
+
+
+def report(args, concurrency, elapsed, kvs, results, lost):
+    errors = sum(len(messages) for messages in results.errors.values())
+    requests = sum(len(timings) for timings in results.timings.values()) + errors
+    print(u"model={} backend={} concurrency={} students={} store latency={}ms".format(
+        args.model, args.backend, concurrency, args.students, args.store_latency))
+    print(u"  {} requests in {:.2f} s: {:.1f} requests/s, {:.1f} students/s, {} errors".format(
+        requests, elapsed, requests / elapsed, args.students / elapsed, errors))
+    print(u"  {:<28}{:>8}{:>10}{:>10}{:>10}{:>10}".format("handler (ms)", "calls", "p50", "p90", "p99", "max"))
+    for handler_name in HANDLERS:
+        values = sorted(results.timings[handler_name])
+        latencies = [1000 * percentile(values, fraction) for fraction in (0.5, 0.9, 0.99, 1.0)]
+        print(u"  {:<28}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}{:>10.3f}".format(handler_name, len(values), *latencies))
+    print(u"  {:<28}{:>8}{:>12}".format("field", "writes", "bytes"))
+    for name in sorted(kvs.writes, key=lambda name: kvs.writes[name][1], reverse=True):
+        print(u"  {:<28}{:>8}{:>12}".format(name, *kvs.writes[name]))
+    for handler_name in HANDLERS:
+        if results.errors[handler_name]:
+            print(u"  {} failed {} times, first with {}".format(
+                handler_name, len(results.errors[handler_name]), results.errors[handler_name][0]))
+    print(u"  lost updates: {} of {} hints added, {} of {} votes counted".format(
+        lost[0], len(results.added_hints), lost[1], sum(results.votes.values())))
+
+
+def load_test(concurrency, args):
+    directory = tempfile.mkdtemp(prefix="crowdsourcehinter-load-")
+    try:
+        settings = {}
+        if args.backend == "sqlite":
+            settings = {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": os.path.join(directory, "hints.db")}
+        kvs = LoadTestKeyValueStore(args.store_latency / 1000.0)
+        scenario_block(kvs, settings, args.hint_limit)
+        kvs.writes.clear()
+        results = LoadTestResults()
+        run = run_threads if args.model == "threads" else run_asyncio
+        _, elapsed = timed(run, kvs, settings, args, concurrency, results)
+        report(args, concurrency, elapsed, kvs, results, lost_updates(kvs, settings, results))
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="numbers of requests in flight, one run each")
+    parser.add_argument("--model", choices=("threads", "asyncio"), default="threads")
+    parser.add_argument("--backend", choices=("fields", "sqlite"), default="fields")
+    parser.add_argument("--store-latency", type=float, default=1.0,
+                        help="milliseconds each read and save of the fields takes")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="most seconds a student waits between requests")
+    parser.add_argument("--hint-limit", type=int, default=1000,
+                        help="hints kept per answer; high by default so evictions aren't counted as lost")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    for concurrency in args.concurrency:
+        load_test(concurrency, args)
+
+
+if __name__ == "__main__":
+    main()
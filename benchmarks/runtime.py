@@ -0,0 +1,138 @@
+"""
+An in-memory stand-in for the XBlock runtime of the LMS.
+
+Field values are kept as JSON text, as the LMS keeps them in its
+database, so that loading a block and saving its fields costs the same
+(de)serialization as in production. Handlers are called through the
+XBlock handler machinery with a WebOb request.
+"""
+import json
+import time
+
+from webob import Request
+from xblock.fields import ScopeIds
+from xblock.runtime import DictKeyValueStore, KvsFieldData, MemoryIdManager, Runtime
+
+from crowdsourcehinter import CrowdsourceHinter
+
+
+class JsonKeyValueStore(DictKeyValueStore):
+    """
+    A key-value store keeping every value as JSON text.
+    """
+
+    def get(self, key):
+        return json.loads(self.db_dict[key])
+
+    def set(self, key, value):
+        self.db_dict[key] = json.dumps(value)
+
+    def set_many(self, update_dict):
+        for key, value in update_dict.items():
+            self.set(key, value)
+
+    def field_sizes(self):
+        """
+        Return the serialized size in bytes of each field, summed over
+        all scopes and users, as {field name: bytes}.
+        """
+        sizes = {}
+        for key, value in self.db_dict.items():
+            sizes[key.field_name] = sizes.get(key.field_name, 0) + len(value.encode("utf8"))
+        return sizes
+
+
+class SettingsService(object):
+    """
+    The XBlock settings service, returning the same bucket for every
+    block.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def get_settings_bucket(self, block, default=None):
+        return self.settings
+
+
+class BenchmarkRuntime(Runtime):
+    """
+    A runtime for driving CrowdsourceHinter blocks outside of the LMS.
+    """
+
+    def __init__(self, kvs, settings=None):
+        id_manager = MemoryIdManager()
+        super(BenchmarkRuntime, self).__init__(
+            id_reader=id_manager,
+            id_generator=id_manager,
+            services={
+                "field-data": KvsFieldData(kvs),
+                "settings": SettingsService(settings or {}),
+            },
+        )
+
+    def handler_url(self, block, handler_name, suffix='', query='', thirdparty=False):
+        return "/handler/{}/{}".format(handler_name, suffix)
+
+    def resource_url(self, resource):
+        return "/resource/{}".format(resource)
+
+    def local_resource_url(self, block, uri):
+        return "/local_resource/{}".format(uri)
+
+    def publish(self, block, event_type, event_data):
+        pass
+
+
+class StaffUser(object):
+    """
+    Stands in for the xmodule_runtime that tells the block its user is staff.
+    """
+    user_is_staff = True
+
+
+def make_block(kvs, user_id="student", settings=None, staff=False, usage_id="hinter"):
+    """
+    Load a CrowdsourceHinter for a user from a key-value store, as the LMS
+    does at the start of every request.
+    """
+    runtime = BenchmarkRuntime(kvs, settings)
+    block = CrowdsourceHinter(
+        runtime, scope_ids=ScopeIds(user_id, "crowdsourcehinter", usage_id, usage_id)
+    )
+    if staff:
+        block.xmodule_runtime = StaffUser()
+    return block
+
+
+def call_handler(block, handler_name, data):
+    """
+    Call a JSON handler of a block and save its fields, as the LMS does
+    for a handler request.
+
+    Returns:
+      the decoded JSON response
+    """
+    request = Request.blank("/", method="POST", body=json.dumps(data).encode("utf8"))
+    response = block.handle(handler_name, request)
+    block.save()
+    return json.loads(response.body.decode("utf8"))
+
+
+def timed(function, *args, **kwargs):
+    """
+    Call a function and return (its result, elapsed seconds).
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(sorted_values, fraction):
+    """
+    Return the value at a fraction (0 to 1) of a sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,256 @@
+"""
+Canonicalization and near matching of student answers.
+
+Student answers are canonicalized before they are used as keys of the
+hint database, so that e.g. "Michigan " and "michigan" share hints. When
+a canonical answer has no hints, a trigram index over the answers that do
+have hints finds the closest one by edit distance without comparing the
+answer to every other one.
+
+The answers to the second and later inputs of a problem with several
+inputs are kept under their own namespace, e.g. "[input 2] 42", so that
+the hints for a wrong second blank are not shown for the same wrong
+first blank. Answers to the first input keep their plain key, which is
+the key every answer had before problems with several inputs were
+supported, unless they start like a namespace themselves: a first answer
+"[input 2] 42" is kept as "[input 1] [input 2] 42".
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# The canonicalization steps, applied in the order they are configured.
+CANONICALIZATION_STEPS = ("unicode", "lowercase", "whitespace", "punctuation", "numeric")
+
+# The steps of blocks that don't configure any.
+DEFAULT_CANONICALIZATION = ("lowercase",)
+
+# Answers longer than this are not near matched: they are unlikely to be
+# typos of each other and are expensive to compare.
+NEAR_MATCH_MAX_LENGTH = 100
+
+# The number of blocks whose near match index is kept in memory.
+NEAR_MATCH_CACHE_SIZE = 128
+
+# The key of an answer to the second or a later input of a problem.
+INPUT_NAMESPACE_FORMAT = u"[input {}] {}"
+INPUT_NAMESPACE_PATTERN = re.compile(r"^\[input (\d+)\] ")
+
+
+def canonicalize(answer, steps, numeric_tolerance=0.0):
+    """
+    Return the canonical form of a student answer.
+
+    Args:
+      answer: the answer as submitted
+      steps: the names of the CANONICALIZATION_STEPS to apply, in order
+      numeric_tolerance: numeric answers are rounded to a multiple of this
+        by the "numeric" step, if it is not 0
+    """
+    for step in steps:
+        if step == "unicode":
+            answer = unicodedata.normalize("NFKC", answer)
+        elif step == "lowercase":
+            answer = answer.lower()
+        elif step == "whitespace":
+            answer = " ".join(answer.split())
+        elif step == "punctuation":
+            answer = "".join(char for char in answer if not unicodedata.category(char).startswith("P"))
+        elif step == "numeric":
+            answer = canonicalize_number(answer, numeric_tolerance)
+        else:
+            raise ValueError("Unknown canonicalization step: {}".format(step))
+    return answer
+
+
+def canonicalize_number(answer, tolerance):
+    """
+    Return a numeric answer in a standard notation, rounded to a multiple
+    of tolerance. Answers that are not numbers are returned unchanged.
+    """
+    try:
+        value = float(answer)
+    except ValueError:
+        return answer
+    if value != value or value in (float("inf"), float("-inf")):
+        return answer
+    if tolerance:
+        value = round(value / tolerance) * tolerance
+    return "%.12g" % value
+
+
+def namespace_answer(position, answer):
+    """
+    Return the key of the hints of an answer to the input at a position
+    (counted from 0) of a problem.
+    """
+    if position == 0 and INPUT_NAMESPACE_PATTERN.match(answer) is None:
+        return answer
+    return INPUT_NAMESPACE_FORMAT.format(position + 1, answer)
+
+
+def split_namespace(key):
+    """
+    Split an answer key into the position (counted from 0) of the input
+    it belongs to and the answer.
+    """
+    match = INPUT_NAMESPACE_PATTERN.match(key)
+    if match is None:
+        return 0, key
+    return int(match.group(1)) - 1, key[match.end():]
+
+
+def edit_distance(first, second, limit):
+    """
+    Return the Levenshtein distance between two strings, or limit + 1 if
+    it is greater than limit.
+    """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (first_char != second_char)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def trigrams(word):
+    """
+    Return the set of trigrams of a string, padded so that its first and
+    last characters are part of several trigrams.
+    """
+    padded = "  " + word + " "
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TrigramIndex(object):
+    """
+    An index of strings by their trigrams, for finding the strings within
+    a small edit distance of a query.
+
+    Each edit destroys at most three trigrams, so a string within edit
+    distance d of the query shares at least (trigrams of the query - 3d)
+    trigrams with it. Only the strings that pass this count (found through
+    the postings of the query's trigrams) are compared character by
+    character. Queries too short for the count to rule anything out fall
+    back to comparing the strings of a similar length.
+
+    The index is shared by the threads of a process, so sync and search
+    hold its lock.
+    """
+
+    def __init__(self, words=()):
+        self.postings = {}
+        self.lengths = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        """
+        Add a string to the index.
+        """
+        same_length = self.lengths.setdefault(len(word), set())
+        if word in same_length:
+            return
+        same_length.add(word)
+        for trigram in trigrams(word):
+            self.postings.setdefault(trigram, set()).add(word)
+        self.size += 1
+
+    def remove(self, word):
+        """
+        Remove a string from the index.
+        """
+        same_length = self.lengths.get(len(word))
+        if not same_length or word not in same_length:
+            return
+        same_length.remove(word)
+        if not same_length:
+            del self.lengths[len(word)]
+        for trigram in trigrams(word):
+            postings = self.postings[trigram]
+            postings.remove(word)
+            if not postings:
+                del self.postings[trigram]
+        self.size -= 1
+
+    def sync(self, words):
+        """
+        Make the index hold exactly the given strings, indexing only the
+        ones it doesn't have yet.
+        """
+        words = set(words)
+        with self.lock:
+            indexed = set().union(*self.lengths.values())
+            for word in indexed - words:
+                self.remove(word)
+            for word in words - indexed:
+                self.add(word)
+
+    def search(self, word, max_distance):
+        """
+        Return the strings within max_distance of word as a list of
+        (distance, string), closest first.
+        """
+        grams = trigrams(word)
+        needed = len(grams) - 3 * max_distance
+        with self.lock:
+            if needed > 0:
+                shared = {}
+                for trigram in grams:
+                    for candidate in self.postings.get(trigram, ()):
+                        shared[candidate] = shared.get(candidate, 0) + 1
+                candidates = [candidate for candidate, count in shared.items() if count >= needed]
+            else:
+                candidates = [candidate
+                              for length in range(len(word) - max_distance, len(word) + max_distance + 1)
+                              for candidate in self.lengths.get(length, ())]
+        results = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                results.append((distance, candidate))
+        results.sort()
+        return results
+
+
+_near_match_indexes = OrderedDict()
+_near_match_lock = threading.Lock()
+
+
+def near_match_index(key, version, load_answers):
+    """
+    Return a TrigramIndex of the answers of a block, cached per process.
+
+    Args:
+      key: identifies the block
+      version: changes whenever the block's set of answers changes; the
+        cached index is brought up to date when it does, indexing only
+        the answers that are new
+      load_answers: function returning the block's answers
+    """
+    with _near_match_lock:
+        cached = _near_match_indexes.pop(key, None)
+        if cached is not None and cached[0] == version:
+            _near_match_indexes[key] = cached
+            return cached[1]
+    answers = [answer for answer in load_answers() if len(answer) <= NEAR_MATCH_MAX_LENGTH]
+    if cached is None:
+        index = TrigramIndex(answers)
+    else:
+        index = cached[1]
+        index.sync(answers)
+    with _near_match_lock:
+        _near_match_indexes[key] = (version, index)
+        while len(_near_match_indexes) > NEAR_MATCH_CACHE_SIZE:
+            _near_match_indexes.popitem(last=False)
+    return index
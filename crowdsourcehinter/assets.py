@@ -0,0 +1,80 @@
+"""
+Static assets of the CrowdsourceHinter views, loaded once per process.
+
+Every render of a view used to read and decode its HTML, CSS and
+JavaScript through pkg_resources. The assets of each view are now
+loaded the first time the view is rendered and kept for the life of the
+process. When the MINIFY_ASSETS XBlock setting is true and the optional
+rjsmin and rcssmin packages are installed (pip install
+crowdsourcehinter-xblock[minify]), the JavaScript and CSS are minified
+as they are loaded.
+"""
+import collections
+import threading
+
+import pkg_resources
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:
+    rcssmin = rjsmin = None
+
+# The vendored copy of mustache.js, served as a local resource of the
+# block instead of from a CDN.
+MUSTACHE_JS = "public/3rdParty/mustache.js"
+
+ViewAssets = collections.namedtuple("ViewAssets", ["html", "css", "javascript"])
+
+# The static files of each view, relative to the package.
+VIEW_FILES = {
+    "student": ViewAssets(html="static/html/crowdsourcehinter.html",
+                          css=("static/css/crowdsourcehinter.css",),
+                          javascript=("static/js/src/crowdsourcehinter.js",)),
+    "studio": ViewAssets(html="static/html/crowdsourcehinterstudio.html",
+                         css=("static/css/crowdsourcehinter.css",),
+                         javascript=("static/js/src/crowdsourcehinter_studio.js",)),
+}
+
+_view_assets = {}
+_view_assets_lock = threading.Lock()
+
+
+def resource_string(path):
+    """
+    Return the decoded contents of a file of the package.
+    """
+    return pkg_resources.resource_string(__name__, path).decode("utf8")
+
+
+def load_view_assets(view, minify=False):
+    """
+    Read the files of a view, bundling its CSS files into one string and
+    its JavaScript files into another, minified if asked to and possible.
+    """
+    files = VIEW_FILES[view]
+    css = "\n".join(resource_string(path) for path in files.css)
+    javascript = "\n;\n".join(resource_string(path) for path in files.javascript)
+    if minify and rjsmin is not None:
+        css = rcssmin.cssmin(css)
+        javascript = rjsmin.jsmin(javascript)
+    return ViewAssets(html=resource_string(files.html), css=css, javascript=javascript)
+
+
+def view_assets(view, minify=False):
+    """
+    Return the ViewAssets (html, css, javascript strings) of a view,
+    loaded the first time they are needed.
+
+    Args:
+      view: "student" or "studio"
+      minify: whether to minify the CSS and JavaScript
+    """
+    key = (view, minify)
+    assets = _view_assets.get(key)
+    if assets is None:
+        with _view_assets_lock:
+            assets = _view_assets.get(key)
+            if assets is None:
+                assets = _view_assets[key] = load_view_assets(view, minify)
+    return assets
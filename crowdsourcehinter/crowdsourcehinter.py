@@ -1,36 +1,127 @@
 import copy
+import hashlib
 import json
 import logging
 import random
+import threading
+from collections import OrderedDict
 
-import pkg_resources
+import six
 import six.moves.html_parser
 import six.moves.urllib.error
 import six.moves.urllib.parse
 import six.moves.urllib.request
 from web_fragments.fragment import Fragment
+from webob import Response
 from xblock.core import XBlock
-from xblock.fields import Scope, Dict, List, String
+from xblock.fields import Scope, Dict, Float, Integer, List, String
+
+from .answers import (CANONICALIZATION_STEPS, DEFAULT_CANONICALIZATION, NEAR_MATCH_MAX_LENGTH, canonicalize,
+                      namespace_answer, near_match_index, split_namespace)
+from .assets import MUSTACHE_JS, resource_string, view_assets
+from .metrics import Metrics, get_metrics_sink, instrumented
+from .ranking import EVICTION_POLICIES, RANKING_POLICIES
+from .similarity import find_similar_hint
+from .storage import POPULAR_ANSWER_LIMIT, REPORT_SORTS, block_settings, get_hint_store
+from .transfer import export_lines, import_lines
 
 log = logging.getLogger(__name__)
 html_parser = six.moves.html_parser.HTMLParser()
 
+# The number of recent answer/hint pairs kept in a student's
+# hint_history, besides the first one.
+HINT_HISTORY_SIZE = 5
+
+# The number of most recent [answer, hint] pairs kept in a student's
+# voted_hints.
+VOTED_HINTS_SIZE = 20
+
+# The most ratings rate_hints applies in one request.
+MAX_BATCH_RATINGS = 500
+
+# The ratings that are votes, which a student gives each hint once.
+VOTE_RATINGS = ('upvote', 'downvote')
+
+# The default and largest number of reported hints per page of
+# reported_hints_page.
+REPORTED_PAGE_SIZE = 20
+MAX_REPORTED_PAGE_SIZE = 100
+
+# The most answers whose hints prefetch_hints returns.
+MAX_PREFETCH_HINTS = POPULAR_ANSWER_LIMIT
+
+# Shown when an incorrect answer has no hints and there are no generic
+# hints.
+NO_HINTS_MESSAGE = "Sorry, there are no hints for this answer."
+
+# Sent as the answer of a reported hint by the staff moderation view
+# before hints were reported per answer.
+LEGACY_REPORTED_ANSWER = "Reported"
+
+# The optional settings parse_xml reads from the block's JSON, each with
+# a function telling whether a value is allowed, or None to take any value.
+XML_SETTINGS = (
+    ('hint_limit', None),
+    ('hint_eviction_policy', lambda policy: policy in EVICTION_POLICIES),
+    ('hint_ranking_policy', lambda policy: policy in RANKING_POLICIES),
+    ('hint_exploration_rate', None),
+    ('prefetch_hint_count', None),
+    ('answer_canonicalization',
+     lambda steps: isinstance(steps, list) and all(step in CANONICALIZATION_STEPS for step in steps)),
+    ('numeric_tolerance', None),
+    ('near_match_distance', None),
+    ('duplicate_hint_similarity', None),
+)
+
+# The number of blocks whose computed initial hints fingerprint is kept
+# in memory.
+FINGERPRINT_CACHE_SIZE = 1024
 
+_initial_hints_fingerprints = OrderedDict()
+_fingerprint_lock = threading.Lock()
+
+
+@XBlock.wants('settings')
 class CrowdsourceHinter(XBlock):
     """
     This is the Crowdsource Hinter XBlock. This Xblock provides
     students with hints that specifically address their
     mistake. The hints are crowdsourced from the students.
+
+    The crowdsourced data (hint_database, reported_hints and the
+    fields derived from them) is read and written through a HintStore,
+    which keeps it in these fields by default. See storage.py.
     """
 
     # Database of hints. hints are stored:
-    #   {"incorrect_answer": {"hint": rating}}.
-    # Each key (incorrect answer) has a corresponding dictionary (in
-    # which hints are keys and the hints' ratings are the values).
+    #   {"incorrect_answer": [["hint", upvotes, downvotes], ...]}.
+    # Each key (incorrect answer) has a corresponding list of its
+    # hints, oldest first. The other fields refer to a hint of an
+    # answer by its key, a hash of its text (see hint_key in
+    # storage.py).
     # For example:
-    #   {"computerr": {"You misspelled computer, remove the last r.": {'upvotes':5, 'downvotes':3}}}
+    #   {"computerr": [["You misspelled computer, remove the last r.", 5, 3]]}
+    #
+    # The field is saved whole, so when two students vote at the same
+    # time, one of the votes may be lost. Use the SQLite storage backend
+    # (see storage.py) where votes must not be lost.
+    #
+    # Blocks created before hint_database_format 2 stored
+    #   {"incorrect_answer": {"hint": {'upvotes': 5, 'downvotes': 3}}}
+    # and are upgraded the first time they are used.
     hint_database = Dict(default={}, scope=Scope.user_state_summary)
 
+    # Incremented whenever an incorrect answer gets a bucket in
+    # hint_database or loses it, so that the near match index of the
+    # answers can tell when it is out of date.
+    hint_answers_version = Integer(default=0, scope=Scope.user_state_summary)
+
+    # The version of the encoding of hint_database and reported_hints.
+    # 1 is the original encoding keyed by hint text,
+    # and 2 the encoding with the texts in hint_database and hint keys
+    # elsewhere.
+    hint_database_format = Integer(default=1, scope=Scope.user_state_summary)
+
     # Database of initial hints, set by the course
     # instructor. hint_database will receive the hints inputted in
     # initial_hints. Initial hints have a default rating of 0.
@@ -39,12 +130,30 @@ class CrowdsourceHinter(XBlock):
     #  {"Jeorge Washington": "You spelled his first name wrong."}
     initial_hints = Dict(default={}, scope=Scope.content)
 
-    # This is a list of incorrect answer submissions made by the
-    # student. this list is used when the student starts rating hints,
-    # to find which incorrect answer's hint a student voted on.
+    # Fingerprint of the current initial_hints, updated whenever the
+    # initial hints are set from the studio view or the XML.
+    initial_hints_version = String(default="", scope=Scope.content)
+
+    # Fingerprint of the initial_hints that were last merged into
+    # hint_database. Initial hints are only merged again when this
+    # differs from initial_hints_version, rather than on every request.
+    seeded_initial_hints_version = String(default="", scope=Scope.user_state_summary)
+
+    # The incorrect answers submitted by the student and the hint shown
+    # for each, as [answer, hint] pairs (hint is None if there were no
+    # hints to show). The first pair is kept until the student answers
+    # correctly and is asked to rate its hint; after it, only the
+    # HINT_HISTORY_SIZE most recent distinct pairs are kept. The hints
+    # in it are not shown to the student again while there are others.
     #
     # For example:
-    #  ["personal computer", "PC", "computerr"]
+    #  [["computerr", "You misspelled computer, remove the last r."],
+    #   ["pc", "Write the full name."]]
+    hint_history = List([], scope=Scope.user_state)
+
+    # The incorrect answers and the hints shown to the student, as
+    # two growing lists, before hint_history replaced them. They are
+    # moved to hint_history the first time it is used.
     incorrect_answers = List([], scope=Scope.user_state)
 
     # A dictionary of generic_hints. default hints will be shown to
@@ -56,34 +165,121 @@ class CrowdsourceHinter(XBlock):
     #  ["Make sure to check your answer for simple mistakes like typos!"]
     generic_hints = List(default=[], scope=Scope.content)
 
-    # This is a list hints have been shown to the student. We'd like
-    # to avoid showing the same hint from showing up to a student (if
-    # they submit the same incorrect answers multiple times), and we
-    # may like to know this after the students submits a correct
-    # answer (if we want to e.g. vet hints)
+    # See incorrect_answers.
+    used = List([], scope=Scope.user_state)
+
+    # The hints the student has rated, or upvoted by submitting them
+    # again, as [answer, hint] pairs. Submitting a hint the student has
+    # already voted for doesn't upvote it again. Only the
+    # VOTED_HINTS_SIZE most recent pairs are kept.
     #
     # For example:
-    #   ["You misspelled computer, remove the last r."]
-    used = List([], scope=Scope.user_state)
+    #  [["computerr", "You misspelled computer, remove the last r."]]
+    voted_hints = List([], scope=Scope.user_state)
 
     # This is a dictionary of hints that have been flagged or reported
-    # as malicious (spam, profanity, give-aways, etc.). The values
-    # represent incorrect answer submissions. The keys are the hints
-    # the corresponding hints. hints with identical text for differing
-    # answers will all not show up for the student.
+    # as malicious (spam, profanity, give-aways, etc.). The keys are
+    # incorrect answer submissions, and the values the keys of the
+    # hints reported for that answer. A reported hint only stops
+    # showing up for the answer it was reported for. Keys of hints no
+    # longer in that answer's hints in hint_database are ignored.
     #
     # For example:
-    #  {"desk": "You're completely wrong, the answer is supposed to be computer."}
-    # TODO: It's not clear how this data structure will manage multiple
-    # reported hints for the same wrong answer.
+    #  {"desk": ["1d6bc2c4e2f3e4b1", "90c1e3a1be0fd1b5"]}
     reported_hints = Dict(default={}, scope=Scope.user_state_summary)
 
+    # The time (seconds since the epoch) each hint in reported_hints
+    # was reported, by answer and hint key, for listing reported hints
+    # by report time.
+    #
+    # For example:
+    #  {"desk": {"1d6bc2c4e2f3e4b1": 1462381622.5}}
+    report_times = Dict(default={}, scope=Scope.user_state_summary)
+
+    # The incorrect answers submitted by students that had no hints to
+    # show, with the number of times they were submitted. Only the
+    # most frequent answers are kept (see UNHINTED_ANSWER_LIMIT in
+    # storage.py), so that staff can see which answers most need
+    # hints. Answers only get a bucket in hint_database once they
+    # receive a hint. Only a sample of the submissions is counted (see
+    # UNHINTED_ANSWER_SAMPLE_RATE), so the counts are estimates.
+    #
+    # For example:
+    #   {"michigna": 12, "lansing": 3}
+    unhinted_answers = Dict(default={}, scope=Scope.user_state_summary)
+
+    # The incorrect answers whose hints have the most votes, with the
+    # number of votes, for prefetch_hints. Only the most voted answers
+    # are kept (see POPULAR_ANSWER_LIMIT in storage.py), so that
+    # finding them doesn't read every hint.
+    #
+    # For example:
+    #   {"michigann": 40, "michiganp": 17}
+    popular_answers = Dict(default={}, scope=Scope.user_state_summary)
+
     # This String represents the xblock target problem element for
     # which the hinter is delivering hints. It is necessary to
     # manually set this value in the XML file under the format
     # "target_problem": "i4x://edX/DemoX/problem/Text_Input"
     target_problem = String(default="", scope=Scope.content)
 
+    # The maximum number of hints kept for any single incorrect
+    # answer. When adding a hint takes an answer over this limit,
+    # another hint is evicted from that answer according to
+    # hint_eviction_policy.
+    hint_limit = Integer(default=10, scope=Scope.content)
+
+    # How the hint to evict is chosen once an answer has more than
+    # hint_limit hints: "net_score" evicts the hint with the lowest
+    # upvotes - downvotes, "wilson" the hint with the lowest Wilson
+    # score lower bound and "oldest" the hint that was added first.
+    hint_eviction_policy = String(default="net_score", scope=Scope.content, values=EVICTION_POLICIES)
+
+    # How the hints of an answer are ranked: "net_score" by upvotes -
+    # downvotes, "wilson" by the lower bound of the Wilson score
+    # interval of their fraction of upvotes, and "bayesian" by their
+    # fraction of upvotes averaged with a few imaginary votes. The last
+    # two let a new hint with mostly upvotes overtake an old hint with
+    # many votes of both kinds.
+    hint_ranking_policy = String(default="net_score", scope=Scope.content, values=RANKING_POLICIES)
+
+    # The fraction of hints shown that are chosen at random among the
+    # answer's hints with few votes (see EXPLORATION_VOTES in
+    # ranking.py) instead of being the best one, so that new hints get
+    # rated. 0 disables exploration.
+    hint_exploration_rate = Float(default=0.0, scope=Scope.content)
+
+    # The number of incorrect answers (those whose hints have the most
+    # votes) whose best hint is sent to the student's browser when the
+    # hinter loads, so that these answers get a hint without a request.
+    # 0 disables prefetching.
+    prefetch_hint_count = Integer(default=0, scope=Scope.content)
+
+    # The steps used to canonicalize student answers before looking up
+    # hints, in order. See CANONICALIZATION_STEPS in answers.py:
+    # "unicode" (NFKC normalization), "lowercase", "whitespace"
+    # (trim and collapse), "punctuation" (remove) and "numeric" (write
+    # numbers in a standard form, rounded to numeric_tolerance).
+    # Changing the steps or numeric_tolerance merges the initial hints
+    # again under their new keys, but the hints students added stay under
+    # the keys of the old settings, where new answers no longer find them.
+    answer_canonicalization = List(default=list(DEFAULT_CANONICALIZATION), scope=Scope.content)
+
+    # Numeric answers are rounded to a multiple of this by the
+    # "numeric" canonicalization step. 0 disables rounding.
+    numeric_tolerance = Float(default=0.0, scope=Scope.content)
+
+    # When an answer has no hints, the hints of the closest answer
+    # within this edit distance are shown instead. 0 disables near
+    # matching.
+    near_match_distance = Integer(default=0, scope=Scope.content)
+
+    # A new hint whose similarity (0 to 1, see similarity.py) to a hint
+    # the answer already has is at least this is counted as an upvote
+    # of that hint instead of being added. 1 only catches hints that
+    # differ in case, punctuation and whitespace.
+    duplicate_hint_similarity = Float(default=0.8, scope=Scope.content)
+
     def studio_view(self, context=None):
         """
         This function defines a view for editing the XBlock when embedding
@@ -93,11 +289,7 @@ class CrowdsourceHinter(XBlock):
         It is currently incomplete -- we still need to finish building the
         authoring view.
         """
-        html = self.resource_string("static/html/crowdsourcehinterstudio.html")
-        frag = Fragment(html)
-        frag.add_javascript_url('//cdnjs.cloudflare.com/ajax/libs/mustache.js/0.8.1/mustache.min.js')
-        frag.add_css(self.resource_string("static/css/crowdsourcehinter.css"))
-        frag.add_javascript(self.resource_string("static/js/src/crowdsourcehinter_studio.js"))
+        frag = self.view_fragment("studio")
         frag.initialize_js('CrowdsourceHinterStudio',
                            {'initial': json.dumps(self.initial_hints),
                             'generic': json.dumps(self.generic_hints),
@@ -105,6 +297,7 @@ class CrowdsourceHinter(XBlock):
         return frag
 
     @XBlock.json_handler
+    @instrumented
     def set_initial_settings(self, data, suffix=''):
         """
         Set intial hints, generic hints, and problem element from the
@@ -127,6 +320,7 @@ class CrowdsourceHinter(XBlock):
                     'error' : 'Initial hints should be a dict.'}
 
         self.initial_hints = initial_hints
+        self.initial_hints_version = self.fingerprint_initial_hints(initial_hints)
         self.generic_hints = generic_hints
         if len(data['target_problem']) > 1:
             self.target_problem = data['target_problem']
@@ -137,137 +331,339 @@ class CrowdsourceHinter(XBlock):
         This view renders the hint view to the students. The HTML has the hints templated
         in, and most of the remaining functionality is in the JavaScript.
         """
-        html = self.resource_string("static/html/crowdsourcehinter.html")
-        frag = Fragment(html)
-        frag.add_javascript_url('//cdnjs.cloudflare.com/ajax/libs/mustache.js/0.8.1/mustache.min.js')
-        frag.add_css(self.resource_string("static/css/crowdsourcehinter.css"))
-        frag.add_javascript(self.resource_string("static/js/src/crowdsourcehinter.js"))
+        frag = self.view_fragment("student")
         frag.initialize_js('CrowdsourceHinter',
                            {'target_problem': self.target_problem,
-                            'isStaff': self.get_user_is_staff()})
+                            'isStaff': self.get_user_is_staff(),
+                            'answer_canonicalization': self.answer_canonicalization,
+                            'prefetch': self.prefetch_hint_count > 0})
+        return frag
+
+    def view_fragment(self, view):
+        """
+        Return a Fragment with the HTML, CSS and JavaScript of a view,
+        from the assets cached for the process, and the vendored
+        mustache.js.
+        """
+        assets = view_assets(view, bool(block_settings(self).get("MINIFY_ASSETS")))
+        frag = Fragment(assets.html)
+        frag.add_javascript_url(self.runtime.local_resource_url(self, MUSTACHE_JS))
+        frag.add_css(assets.css)
+        frag.add_javascript(assets.javascript)
         return frag
 
     def extract_student_answers(self, answers):
         """
         We find out what the student submitted by listening to a
         client-side event. This event is a little bit messy. This
-        function cleans up the event into a dictionary mapping
-        input IDs to answers submitted.
+        function cleans up the event into an OrderedDict mapping
+        input IDs to answers submitted, in the order of the inputs.
         """
-        # First, we split this into the submission
-        answers = [a.split('=') for a in answers.split("&")]
+        # First, we split this into the submission. Answers may contain
+        # "=", so only the first one separates the input ID.
+        pairs = [a.partition('=') for a in answers.split("&") if a]
         # Next, we decode the HTML escapes
-        answers = [(a[0], six.moves.urllib.parse.unquote_plus(a[1])) for a in answers]
-        return dict(answers)
+        unquote = six.moves.urllib.parse.unquote_plus
+        return OrderedDict((unquote(input_id), unquote(answer)) for input_id, _, answer in pairs)
 
-    def limit_hint_storage(self):
+    @property
+    def hint_store(self):
         """
-        Remove hints so that any particular answer in hint_database
-        doesn't have more than 10 hints. The method of deciding which
-        hints to remove probably will need to be reevaluated at a
-        later time.
+        The HintStore holding this block's crowdsourced hints.
         """
-        for answer in self.hint_database:
-            while len(self.hint_database[answer]) > 10:
-                rating_dict = {}
-                for hint in self.hint_database[answer]:
-                    rating_dict.update({hint: (self.hint_database[answer][hint]["upvotes"] - self.hint_database[answer][hint]["downvotes"])})
-                del self.hint_database[answer][(min(rating_dict, key=rating_dict.get))]
-                    
+        if getattr(self, "_hint_store", None) is None:
+            self._hint_store = get_hint_store(self)
+        return self._hint_store
 
-    def compare_ratings(self, answer, hint, best):
+    @property
+    def metrics(self):
         """
-        Determine if the rating of a hint is better than the current
-        "best" hint. 
+        The Metrics reporting this block's handler timings and hint
+        database sizes. See metrics.py.
         """
-        return (self.hint_database[answer][hint]["upvotes"] - self.hint_database[answer][hint]["downvotes"]) > (self.hint_database[answer][best]["upvotes"] - self.hint_database[answer][best]["downvotes"])
+        if getattr(self, "_metrics", None) is None:
+            self._metrics = Metrics(get_metrics_sink(block_settings(self)),
+                                    {"block": six.text_type(self.scope_ids.usage_id)})
+        return self._metrics
+
+    def report_field_sizes(self):
+        """
+        Report the serialized size of the fields holding the hints, after
+        a handler has changed them. Computing the sizes serializes the
+        fields, so it is skipped when metrics are disabled.
+        """
+        if self.metrics.enabled:
+            for field_name, size in self.hint_store.field_sizes().items():
+                self.metrics.gauge("field_size." + field_name, size)
 
     @XBlock.json_handler
+    @instrumented
     def get_hint(self, data, suffix=''):
         """
         Returns hints to students. Hints with the highest rating are shown
         to students unless the student has already submitted the same
-        incorrect answer previously.
+        incorrect answer previously. In a problem with several inputs,
+        each incorrect input gets its own hint.
 
         Args:
           data['submittedanswer']: The string of text that the student submits for a problem.
+          data['incorrect_inputs']: The list of the IDs of the inputs that were
+            graded incorrect (optional; every input is looked up without it)
         returns:
           'BestHint': the highest rated hint for an incorrect answer
                         or another random hint for an incorrect answer
                         or 'Sorry, there are no hints for this answer.' if no hints exist
-          'StudentAnswer': the student's incorrect answer
+          'StudentAnswer': the student's incorrect answer, as submitted
+          'AnswerKey': the key of the hints of the answer, which rate_hint
+              and add_new_hint take as the answer
           'HintCategory': Either a string for the type of hint, or False
               if no hints
+          'Hints': a list with the above, and the 'InputId', for each
+              incorrect input; the keys above are those of its first item
+        """
+        self.seed_initial_hints()
+        answers = self.extract_student_answers(data["submittedanswer"])
+        # each input has its own namespace of answers, keyed by its
+        # position in the problem
+        inputs = [(input_id, answer, self.canonicalize_answer(answer, position))
+                  for position, (input_id, answer) in enumerate(answers.items())]
+        incorrect_inputs = data.get("incorrect_inputs")
+        if incorrect_inputs and isinstance(incorrect_inputs, list):
+            inputs = [item for item in inputs if item[0] in incorrect_inputs]
+        if not inputs:
+            return {'BestHint': NO_HINTS_MESSAGE, "StudentAnswer": "", "AnswerKey": "", "HintCategory": False,
+                    "Hints": []}
+
+        # look up how many hints every answer has at once
+        counts = self.hint_store.available_hint_counts([key for _input_id, _answer, key in inputs])
+        seen_hints = self.seen_hints()
+        hints = []
+        answers_scanned = hints_scanned = 0
+        for input_id, answer, key in inputs:
+            key, hint_count = self.near_match(key, counts[key])
+            answers_scanned += self.answers_scanned
+            hint = self.hint_for_answer(key, seen_hints, hint_count)
+            hint["StudentAnswer"] = answer
+            hints_scanned += self.hint_store.hints_scanned if hint["HintCategory"] == "ErrorResponse" else 0
+            if hint["HintCategory"]:
+                seen_hints.add(hint["BestHint"])
+            hint["InputId"] = input_id
+            hints.append(hint)
+        self.metrics.count("get_hint.answers_scanned", answers_scanned)
+        self.metrics.count("get_hint.hints_scanned", hints_scanned)
+        response = dict(hints[0])
+        del response["InputId"]
+        response["Hints"] = hints
+        return response
+
+    def seed_initial_hints(self):
+        """
+        Populate hint_database with hints from initial_hints the first
+        time the block is used, and again whenever the instructor
+        changes the initial hints.
         """
-        # Populate hint_database with hints from initial_hints if
-        # there are no hints in hint_database. This probably will
-        # occur only on the very first run of a unit containing this
-        # block, but the logic is a little bit more complex since
-        # we'd like to be able to add additional hints if instructors
-        # chose to do so.
-        for answers in self.initial_hints:
-            if answers not in self.hint_database:
-                self.hint_database[answers] = {}
-            for hints in self.initial_hints[answers]:
-                if hints not in self.hint_database[answers]:
-                    self.hint_database[answers].update({hints: {"upvotes": 0, "downvotes": 0}})
-
-        # We will remove excess hints at this point so that issues
-        # won't arise later due to a hint being removed
-        # (e.x. upvoting a hint that has been removed)
-        # Initial hints will have the opportunity to be added back
-        # into hint_database if the other hints have bad ratings.
-        # This is a temporary solution, and its location or method
-        # of limitation probably should be improved later.
-        self.limit_hint_storage()
-
-        answer = self.extract_student_answers(data["submittedanswer"])
-
-        # HACK: For now, we assume just one submission, a string, and
-        # case insensitive
-        #
-        # TODO: We should replace this with a generic canonicalization
-        # function
-        answer = list(answer.values())[0].lower()
-
-        # Put the student's answer to lower case so that differences
-        # in capitalization don't make different groups of
-        # hints. TODO: We should replace this with a .
-        best_hint = ""  # TODO: What is this?
-
-        if self.hints_available(answer):
-            for hint in self.hint_database[answer]:
-                if hint not in list(self.reported_hints.keys()):
-                    # if best_hint hasn't been set yet or if a hint's rating is greater than the rating of best_hint
-                    if best_hint == "" or self.compare_ratings(answer, hint, best_hint):
-                        best_hint = hint
-            self.used.append(best_hint)
+        version = self.current_initial_hints_version()
+        if version != self.hint_store.seeded_version():
+            self.hint_store.seed(self.initial_hints_lists(), version)
+
+    def hint_for_answer(self, answer, seen_hints, hint_count=None):
+        """
+        Choose the hint to show for an incorrect answer, and record it in
+        the student's hint_history.
+
+        Args:
+          answer: the canonical (and near matched) answer
+          seen_hints: the hints the student has already been shown
+          hint_count: the answer's number of available hints, if already known
+        Returns:
+          a dict of 'BestHint', 'AnswerKey' and 'HintCategory', as
+          returned by get_hint
+        """
+        if self.hints_available(answer, hint_count):
+            best_hint = None
+            if self.hint_exploration_rate and random.random() < self.hint_exploration_rate:
+                # now and then, show a hint that needs more votes
+                best_hint = self.hint_store.explore_hint(answer, seen_hints)
+                if best_hint is not None:
+                    self.metrics.count("get_hint.explored")
+            # show the best hint the student hasn't seen yet, or the
+            # best one if they have seen them all
+            best_hint = (best_hint or self.hint_store.best_hint(answer, seen_hints) or
+                         self.hint_store.best_hint(answer))
+            self.record_hint(answer, best_hint)
             return {'BestHint': best_hint,
-                    "StudentAnswer": answer,
+                    "AnswerKey": answer,
                     "HintCategory": "ErrorResponse"}
         # find generic hints for the student if no specific hints exist
         if self.generic_hints:
-            generic_hint = random.choice(self.generic_hints)
-            self.used.append(generic_hint)
+            unseen = [hint for hint in self.generic_hints if hint not in seen_hints]
+            generic_hint = random.choice(unseen or self.generic_hints)
+            self.record_hint(answer, generic_hint)
             return {'BestHint': generic_hint,
-                    "StudentAnswer": answer,
+                    "AnswerKey": answer,
                     "HintCategory": "Generic"}
         else:
             # if there are no hints in either the database or generic hints
-            self.used.append("There are no hints for" + " " + answer)
-            return {"BestHint": "Sorry, there are no hints for this answer.",
-                    "StudentAnswer": answer,
+            self.record_hint(answer, None)
+            return {"BestHint": NO_HINTS_MESSAGE,
+                    "AnswerKey": answer,
                     "HintCategory": False}
 
-    def hints_available(self, answer):
+    def canonicalize_answer(self, answer, position=None):
+        """
+        Put a student's answer in canonical form, so that trivially
+        different answers (e.g. in capitalization) share hints, and
+        return its key in the hint database.
+
+        Args:
+          answer: the answer
+          position: the position of the input the student gave the answer
+            to, counted from 0; without it, the answer is a key that may
+            already name its input, e.g. "[input 2] 42" in initial_hints
+        """
+        if position is None:
+            position, answer = split_namespace(answer)
+        return namespace_answer(position,
+                                canonicalize(answer, self.answer_canonicalization, self.numeric_tolerance))
+
+    def near_match(self, answer, hint_count=None):
+        """
+        Return the answer whose hints should be shown for a canonical
+        answer, and its number of available hints: the answer itself if
+        it has hints, or else the closest answer to the same input within
+        near_match_distance that has hints to show. The number of answers
+        checked is kept in answers_scanned.
+
+        Args:
+          answer: the canonical answer
+          hint_count: its number of available hints, if already known
+        """
+        self.answers_scanned = 1
+        if hint_count is None:
+            hint_count = self.hint_store.available_hint_count(answer)
+        if not self.near_match_distance or len(answer) > NEAR_MATCH_MAX_LENGTH or hint_count > 0:
+            return answer, hint_count
+        index = near_match_index(six.text_type(self.scope_ids.usage_id),
+                                 self.hint_store.answers_version(),
+                                 self.hint_store.answers)
+        position = split_namespace(answer)[0]
+        for _distance, candidate in index.search(answer, self.near_match_distance):
+            if split_namespace(candidate)[0] != position:
+                continue
+            self.answers_scanned += 1
+            candidate_count = self.hint_store.available_hint_count(candidate)
+            if candidate_count > 0:
+                return candidate, candidate_count
+        return answer, hint_count
+
+    @staticmethod
+    def fingerprint_initial_hints(initial_hints):
+        """
+        Return a fingerprint identifying a version of initial_hints.
+        """
+        if not initial_hints:
+            return ""
+        serialized = json.dumps(initial_hints, sort_keys=True).encode("utf8")
+        return hashlib.sha1(serialized).hexdigest()
+
+    def current_initial_hints_version(self):
+        """
+        Return the fingerprint of the current initial_hints, as seeded
+        under the current canonicalization settings. Blocks created before
+        initial_hints_version existed don't have one stored, so it is
+        computed from initial_hints instead.
+        """
+        version = self.initial_hints_version
+        if not version and self.initial_hints:
+            version = self.cached_initial_hints_fingerprint()
+        if not version or (tuple(self.answer_canonicalization) == DEFAULT_CANONICALIZATION and
+                           not self.numeric_tolerance):
+            # blocks with the default settings keep the fingerprint they
+            # were seeded with before the settings existed
+            return version
+        settings = [version, self.answer_canonicalization, self.numeric_tolerance]
+        return hashlib.sha1(json.dumps(settings).encode("utf8")).hexdigest()
+
+    def cached_initial_hints_fingerprint(self):
+        """
+        Return the fingerprint of initial_hints for a block that has no
+        initial_hints_version, computed once per process. Every change of
+        initial_hints stores a version, so the fingerprint of a block
+        without one can be cached by its usage id.
+        """
+        key = six.text_type(self.scope_ids.usage_id)
+        with _fingerprint_lock:
+            fingerprint = _initial_hints_fingerprints.pop(key, None)
+            if fingerprint is not None:
+                _initial_hints_fingerprints[key] = fingerprint
+                return fingerprint
+        fingerprint = self.fingerprint_initial_hints(self.initial_hints)
+        with _fingerprint_lock:
+            _initial_hints_fingerprints[key] = fingerprint
+            while len(_initial_hints_fingerprints) > FINGERPRINT_CACHE_SIZE:
+                _initial_hints_fingerprints.popitem(last=False)
+        return fingerprint
+
+    def initial_hints_lists(self):
+        """
+        Return initial_hints with canonical answers and every value as
+        a list of hints. Values may also be given as a single hint
+        string.
+        """
+        initial_hints = {}
+        for answer, hints in self.initial_hints.items():
+            if isinstance(hints, six.string_types):
+                hints = [hints]
+            initial_hints.setdefault(self.canonicalize_answer(answer), []).extend(hints)
+        return initial_hints
+
+    def history(self):
+        """
+        Return hint_history, first moving the pairs of the legacy
+        incorrect_answers and used lists into it.
+        """
+        if self.incorrect_answers:
+            answers, hints = list(self.incorrect_answers), list(self.used)
+            del self.incorrect_answers
+            del self.used
+            hints += [None] * (len(answers) - len(hints))
+            for answer, hint in zip(answers, hints):
+                self.record_hint(answer, hint)
+        return self.hint_history
+
+    def record_hint(self, answer, hint):
+        """
+        Add an incorrect answer and the hint shown for it to the
+        student's hint_history. A pair already in the history (other
+        than the first) is moved to the end, and the oldest pairs
+        after the first are dropped to keep at most HINT_HISTORY_SIZE.
+        """
+        history = self.history()
+        pair = [answer, hint]
+        if history and history[0] == pair:
+            return
+        if pair in history:
+            history.remove(pair)
+        history.append(pair)
+        del history[1:-HINT_HISTORY_SIZE]
+
+    def seen_hints(self):
+        """
+        Return the set of hints in the student's hint_history.
+        """
+        return set(hint for _answer, hint in self.history() if hint is not None)
+
+    def hints_available(self, answer, hint_count=None):
         """
         This function is used to check that an incorrect answer has
-        available hints to show.  It will also add the incorrect
-        answer test to self.incorrect_answers.
+        available hints to show. It will also count the answer among
+        the unhinted answers if it has no hints.
 
         Args:
           answer: This is equal to answer from get_hint, the answer 
             the student submitted
+          hint_count: the answer's number of available hints, if already
+            known
         Returns:
            False if there are no hints to show exist. In the future, this
              may change to another falsey value (e.g. zero or an empty
@@ -276,21 +672,17 @@ class CrowdsourceHinter(XBlock):
              to another truthy value (e.g. the hints themselves, or number
              of hints, or similar)
         """
-        isreported = []
-        self.incorrect_answers.append(answer)
-        if answer not in self.hint_database:
-            # add incorrect answer to hint_database if no precedent exists
-            self.hint_database[answer] = {}
-            return False
-        for hint_keys in self.hint_database[answer]:
-            if hint_keys in self.reported_hints:
-                isreported.append(hint_keys)
-        if (len(self.hint_database[answer]) - len(isreported)) > 0:
+        if hint_count is None:
+            hint_count = self.hint_store.available_hint_count(answer)
+        if hint_count > 0:
             return True
         else:
+            # count the answer so that staff can see it needs hints
+            self.hint_store.record_unhinted_answer(answer)
             return False
 
     @XBlock.json_handler
+    @instrumented
     def get_used_hint_answer_data(self, data, suffix=''):
         """
         This function helps to facilitate student rating of hints and
@@ -299,34 +691,61 @@ class CrowdsourceHinter(XBlock):
         submissions and hints. It also will return hints that have
         been reported, although this is only for Staff.
 
+        Args:
+          data['shown']: [answer, hint] pairs the browser showed from prefetched hints,
+                         without asking get_hint (optional)
         Returns:
-          used_hint_answer_text: This dicitonary contains reported hints/answers (if the user is staff) and the
-                         first hint/answer pair that the student submitted for a problem.
+          used_hint_answer_text: This dicitonary contains the first hint/answer pair that the student
+                         submitted for a problem. Staff load reported hints from reported_hints_page.
 
         """
+        for pair in data.get('shown') or []:
+            if (isinstance(pair, list) and len(pair) == 2 and
+                    all(isinstance(item, six.string_types) for item in pair) and
+                    self.hint_store.has_hint(*pair)):
+                self.record_hint(*pair)
         # used_hint_answer_text is a dictionary of hints (or lack thereof) used for a
         # specific answer, as well as 2 other random hints that exist for each answer
         # that were not used. The keys are the used hints, the values are the
         # corresponding incorrect answer
         used_hint_answer_text = {}
-        if self.get_user_is_staff():
-            for key in self.reported_hints:
-                used_hint_answer_text[key] = u"Reported"
-        if len(self.incorrect_answers) == 0:
+        history = self.history()
+        if len(history) == 0:
             return used_hint_answer_text
         else:
             # for the time being only the first answer/hint pair will be shown to the studen
-            if self.used[0] in self.hint_database[self.incorrect_answers[0]]:
+            answer, hint = history[0]
+            if hint is not None and self.hint_store.has_hint(answer, hint):
                 # add new key (hint) to used_hint_answer_text with a value (incorrect answer)
-                used_hint_answer_text[self.used[0]] = self.incorrect_answers[0]
+                used_hint_answer_text[hint] = answer
             else:
                 # if the student's answer had no hints (or all the hints were reported and unavailable) return None
-                used_hint_answer_text[None] = self.incorrect_answers[0]
-        self.incorrect_answers = []
-        self.used = []
+                used_hint_answer_text[None] = answer
+        del self.hint_history
         return used_hint_answer_text
 
     @XBlock.json_handler
+    @instrumented
+    def prefetch_hints(self, data, suffix=''):
+        """
+        Return the best hint of each of the incorrect answers whose hints
+        have the most votes, for the browser to show without calling
+        get_hint. Nothing is recorded in the student's hint_history, and
+        only the hints of those answers are read.
+
+        Returns:
+          'hints': {answer: hint}, for up to prefetch_hint_count answers
+        """
+        self.seed_initial_hints()
+        hints = {}
+        for answer in self.hint_store.popular_answers(min(self.prefetch_hint_count, MAX_PREFETCH_HINTS)):
+            hint = self.hint_store.best_hint(answer)
+            if hint is not None:
+                hints[answer] = hint
+        return {'hints': hints}
+
+    @XBlock.json_handler
+    @instrumented(field_sizes=True)
     def rate_hint(self, data, suffix=''):
         """
         Used to facilitate hint rating by students.
@@ -336,75 +755,270 @@ class CrowdsourceHinter(XBlock):
         Args:
           data['student_answer']: The incorrect answer that corresponds to the hint that is being rated
           data['hint']: The hint that is being rated
-          data['student_rating']: The rating chosen by the student.
+          data['student_rating']: The rating chosen by the student: 'upvote', 'downvote' or
+            'report'. Staff may also 'remove' or 'unreport' a reported hint.
         Returns:
           'rating': the new rating of the hint, or the string 'reported' if the hint was reported
           'hint': the hint that had its rating changed
 
         TODO: Break out into independent functions, or make generic in some way
         """
-        answer_data = data['student_answer']
-        data_rating = data['student_rating']
-        data_hint = data['hint']
+        return self.apply_rating(data['student_answer'], data['hint'], data['student_rating'])
+
+    @XBlock.json_handler
+    @instrumented(field_sizes=True)
+    def rate_hints(self, data, suffix=''):
+        """
+        Apply several ratings at once, e.g. the moderation of many
+        reported hints by staff, so that the hint database is loaded
+        and saved once for all of them.
+
+        Args:
+          data['ratings']: list of {'student_answer', 'hint', 'student_rating'}
+            dicts, as sent to rate_hint, applied in order
+        Returns:
+          'results': for each rating, what rate_hint would have returned
+        """
+        ratings = data.get('ratings')
+        if not isinstance(ratings, list):
+            return {'success': False, 'error': 'Ratings should be a list.'}
+        if len(ratings) > MAX_BATCH_RATINGS:
+            return {'success': False,
+                    'error': 'At most {} ratings can be sent at once.'.format(MAX_BATCH_RATINGS)}
+        results = []
+        # the votes of this batch, which voted_hints may not all fit
+        batch_votes = set()
+        with self.hint_store.transaction():
+            for rating in ratings:
+                try:
+                    answer, hint, student_rating = rating['student_answer'], rating['hint'], rating['student_rating']
+                    if student_rating in VOTE_RATINGS and (answer, hint) in batch_votes:
+                        results.append({'success': False, 'error': 'Already voted'})
+                        continue
+                    results.append(self.apply_rating(answer, hint, student_rating))
+                    if student_rating in VOTE_RATINGS:
+                        batch_votes.add((answer, hint))
+                except (KeyError, TypeError):
+                    results.append({'success': False, 'error': 'Malformed rating'})
+        return {'success': True, 'results': results}
+
+    def apply_rating(self, answer_data, data_hint, data_rating):
+        """
+        Apply one rating (see rate_hint) and return its result.
+        """
+        if not all(isinstance(value, six.string_types) for value in (answer_data, data_hint, data_rating)):
+            return {'success': False, 'error': 'Malformed rating'}
 
         if any(data_hint in generic_hints for generic_hints in self.generic_hints):
             return # TODO: Figure out how to manage generic hints
 
-        if data['student_rating'] == 'unreport':
-            if data_hint in self.reported_hints:
-                self.reported_hints.pop(data_hint, None)
-                return {'rating': 'unreported'}
+        if data_rating in ('unreport', 'remove'):
+            return self.moderate_hint(answer_data, data_hint, data_rating)
 
-        elif data['student_rating'] == 'remove':
-            if data_hint in self.reported_hints:
-                self.hint_database[self.reported_hints[data_hint]].pop(data_hint, None)
-                self.reported_hints.pop(data_hint, None)
-                return {'rating': 'removed'}
-
-        elif data['student_rating'] == 'report':
-            # add hint to Reported dictionary
-            self.reported_hints[data_hint] = answer_data
+        elif data_rating == 'report':
+            # add hint to the reported hints of the answer
+            if not self.hint_store.report(answer_data, data_hint):
+                return {'success': False, 'error': 'Hint not found'}
             return {"rating": 'reported', 'hint': data_hint}
 
-        elif data_rating == 'upvote':
-            self.hint_database[answer_data][data_hint]["upvotes"] += 1
-            return {'success':True}
-
-        elif data_rating == 'downvote':
-            self.hint_database[answer_data][data_hint]["downvotes"] += 1
-            return {'success': True}
+        elif data_rating in VOTE_RATINGS:
+            return self.vote_on_hint(answer_data, data_hint, data_rating)
 
         else:
             return {'success':False, 'error': 'Unrecognized operation'}
 
+    def moderate_hint(self, answer, hint, rating):
+        """
+        Apply a staff rating ('unreport' or 'remove') of a reported hint.
+        """
+        if not self.get_user_is_staff():
+            return {'success': False, 'error': 'Only staff can moderate reported hints.'}
+        reported_answers = self.reported_answers(answer, hint)
+        if not reported_answers:
+            return {'success': False, 'error': 'Hint not reported'}
+        for reported_answer in reported_answers:
+            if rating == 'unreport':
+                self.hint_store.unreport(reported_answer, hint)
+            else:
+                self.hint_store.remove_hint(reported_answer, hint)
+        return {'rating': 'unreported' if rating == 'unreport' else 'removed'}
+
+    def vote_on_hint(self, answer, hint, rating):
+        """
+        Apply a student's 'upvote' or 'downvote' of a hint, unless the
+        student has already voted on it.
+        """
+        if [answer, hint] in self.voted_hints:
+            return {'success': False, 'error': 'Already voted'}
+        if not self.hint_store.has_hint(answer, hint):
+            # the hint may have been evicted or removed since it was shown
+            return {'success': False, 'error': 'Hint not found'}
+        self.hint_store.vote(answer, hint, "upvotes" if rating == 'upvote' else "downvotes")
+        self.record_vote(answer, hint)
+        return {'success': True}
+
+    def record_vote(self, answer, hint):
+        """
+        Add a hint the student voted for to voted_hints, dropping the
+        oldest pairs to keep at most VOTED_HINTS_SIZE.
+        """
+        if [answer, hint] not in self.voted_hints:
+            self.voted_hints.append([answer, hint])
+            del self.voted_hints[:-VOTED_HINTS_SIZE]
 
+    def reported_answers(self, answer, hint):
+        """
+        Return the incorrect answers that a staff action on a reported
+        hint applies to: the given answer if the hint was reported for
+        it, or every answer the hint was reported for if the answer is
+        LEGACY_REPORTED_ANSWER, as sent by older moderation views.
+        """
+        if self.hint_store.is_reported(answer, hint):
+            return [answer]
+        if answer == LEGACY_REPORTED_ANSWER:
+            return self.hint_store.reported_answers(hint)
+        return []
 
     @XBlock.json_handler
+    @instrumented(field_sizes=True)
     def add_new_hint(self, data, suffix=''):
         """
         This function adds a new hint submitted by the student into the hint_database.
         Args:
           data['new_hint_submission']: This is the text of the new hint that the student has submitted.
           data['answer']: This is the incorrect answer for which the student is submitting a new hint.
+        Returns:
+          'result': what happened to the hint, for the student, or 'error'
+            if the hint could not be kept
+          'hint': the existing hint the submission duplicates, if it does
+          'upvoted': whether that hint got an upvote; students only give
+            each hint one
         """
         submission = data['new_hint_submission']
         answer = data['answer']
 
-        # If we don't have the hint already, add it
-        if submission not in self.hint_database[answer]:
-            self.hint_database[answer].update({submission: {'upvotes':0, 'downvotes':0}})
+        # If we don't have the hint (or one very much like it) already, add it
+        existing = self.similar_hint(answer, submission)
+        if existing is None:
+            evicted = self.hint_store.add_hint(answer, submission)
+            self.metrics.count("evictions", len(evicted))
+            if submission in evicted:
+                return {'success': False,
+                        'error': 'This answer cannot keep any more hints, so the hint was not added.'}
             return {'success':True,
                     'result': 'Hint added'}
+        if [answer, existing] in self.voted_hints or self.hint_store.is_reported(answer, existing):
+            # reported hints are hidden until staff moderate them
+            return {'success': True,
+                    'result': 'We already had this hint.',
+                    'hint': existing,
+                    'upvoted': False}
+        self.hint_store.vote(answer, existing, "upvotes")
+        self.record_vote(answer, existing)
         return {'success':True,
-                'result': 'We already had this hint. We gave it an upvote'}
+                'result': 'We already had this hint. We gave it an upvote',
+                'hint': existing,
+                'upvoted': True}
+
+    def similar_hint(self, answer, hint):
+        """
+        Return the hint of an answer that a new hint duplicates: the
+        same hint, or the unreported hint most similar to it if its
+        similarity is at least duplicate_hint_similarity. Returns None if
+        there is none.
+        """
+        if self.hint_store.has_hint(answer, hint):
+            return hint
+        return find_similar_hint(self.hint_store.available_hints(answer), hint, self.duplicate_hint_similarity)
+
+    @XBlock.json_handler
+    @instrumented
+    def unhinted_answers_data(self, data, suffix=''):
+        """
+        Return the incorrect answers that students submitted most often
+        while there were no hints for them, for staff to write hints for.
+
+        Returns:
+          'answers': list of [answer, number of submissions], most frequent first
+        """
+        if not self.get_user_is_staff():
+            return {'success': False, 'error': 'Only staff can see unhinted answers.'}
+        return {'success': True,
+                'answers': self.hint_store.unhinted_answers()}
+
+    @XBlock.json_handler
+    @instrumented
+    def reported_hints_page(self, data, suffix=''):
+        """
+        Return a page of the reported hints, for staff to moderate.
+
+        Args:
+          data['answer']: optional, only list the hints reported for this incorrect answer
+          data['sort']: optional, one of REPORT_SORTS ("time", the oldest reports first, by default)
+          data['cursor']: optional, the 'next_cursor' of the previous page
+          data['page_size']: optional, the number of hints per page (at most MAX_REPORTED_PAGE_SIZE)
+        Returns:
+          'hints': list of {'answer', 'hint', 'upvotes', 'downvotes', 'reported_at'}
+          'next_cursor': the cursor of the next page, or None after the last page
+        """
+        if not self.get_user_is_staff():
+            return {'success': False, 'error': 'Only staff can see reported hints.'}
+        sort = data.get('sort') or "time"
+        if sort not in REPORT_SORTS:
+            return {'success': False, 'error': 'Unknown sort order.'}
+        try:
+            page_size = min(int(data.get('page_size') or REPORTED_PAGE_SIZE), MAX_REPORTED_PAGE_SIZE)
+        except (TypeError, ValueError):
+            return {'success': False, 'error': 'Invalid page size.'}
+        answer = data.get('answer')
+        if answer:
+            answer = self.canonicalize_answer(answer)
+        try:
+            hints, next_cursor = self.hint_store.reported_hints_page(answer or None, sort, data.get('cursor'),
+                                                                     max(page_size, 1))
+        except ValueError as error:
+            return {'success': False, 'error': six.text_type(error)}
+        return {'success': True, 'hints': hints, 'next_cursor': next_cursor}
+
+    @XBlock.handler
+    def export_hints(self, request, suffix=''):
+        """
+        Stream the hints of this block, with their ratings and reports,
+        the initial hints and the generic hints as JSON Lines, for staff.
+        See transfer.py for the format.
+        """
+        if not self.get_user_is_staff():
+            return Response(json_body={'success': False, 'error': 'Only staff can export hints.'}, status=403)
+        return Response(app_iter=export_lines(self), content_type="application/x-ndjson", charset="utf8")
+
+    @XBlock.handler
+    def import_hints(self, request, suffix=''):
+        """
+        Merge JSON Lines in the format of export_hints, sent as the body
+        of the request, into this block's hints, for staff. Hints the block
+        already has keep the larger of their own and the imported count of
+        each kind of vote. Initial and generic
+        hints are content settings, only imported with content=1 in the
+        query string, where they can be saved (Studio or the workbench).
+
+        Returns (as JSON):
+          'imported': the number of records imported of each type
+          'errors': the lines that could not be imported, as "line number: error"
+        """
+        if not self.get_user_is_staff():
+            return Response(json_body={'success': False, 'error': 'Only staff can import hints.'}, status=403)
+        counts, errors = import_lines(self, request.body_file, content=request.GET.get("content") == "1")
+        return Response(json_body={'success': True, 'imported': counts, 'errors': errors})
 
     @XBlock.json_handler
+    @instrumented
     def studiodata(self, data, suffix=''):
         """
-        This function serves to return the dictionary of reported hints to JS. This is intended for use in
+        This function serves to return the dictionary of reported hints
+        ({"answer": ["hint", ...]}) to JS. This is intended for use in
         the studio_view, which is under construction at the moment
         """
-        return self.reported_hints
+        return self.hint_store.reported_hints()
 
     @staticmethod
     def workbench_scenarios():
@@ -434,7 +1048,13 @@ class CrowdsourceHinter(XBlock):
         if xmlText:
             block.generic_hints.append(xmlText["generic_hints"])
             block.initial_hints = copy.copy(xmlText["initial_hints"])
+            block.initial_hints_version = cls.fingerprint_initial_hints(block.initial_hints)
             block.target_problem = xmlText["target_problem"]
+            for name, valid in XML_SETTINGS:
+                if name in xmlText:
+                    if valid is not None and not valid(xmlText[name]):
+                        raise ValueError("Invalid {}: {!r}".format(name, xmlText[name]))
+                    setattr(block, name, xmlText[name])
         return block
 
     # Generic functions/workarounds for XBlock API limitations and incompletions.
@@ -442,8 +1062,7 @@ class CrowdsourceHinter(XBlock):
         """
         This function is used to get the path of static resources.
         """
-        data = pkg_resources.resource_string(__name__, path)
-        return data.decode("utf8")
+        return resource_string(path)
 
     def get_user_is_staff(self):
         """
@@ -0,0 +1,194 @@
+"""
+Instrumentation of the CrowdsourceHinter handlers.
+
+Handlers report their latency, and get_hint and the handlers that change
+the hint database report what they scanned, evicted and stored, to a
+metrics sink chosen in the XBlock settings of the platform, e.g.:
+
+    XBLOCK_SETTINGS = {
+        "CrowdsourceHinter": {
+            "METRICS_BACKEND": "statsd",
+            "STATSD_HOST": "localhost",
+            "STATSD_PORT": 8125,
+        }
+    }
+
+METRICS_BACKEND is one of "none" (the default), "logging", "statsd" and
+"memory". Every metric is tagged with the usage id of the block, so that
+the slow blocks of a course can be told apart.
+"""
+import functools
+import logging
+import socket
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# The prefix of the name of every metric.
+METRICS_PREFIX = "crowdsourcehinter"
+
+
+class MetricsSink(object):
+    """
+    Interface of a destination for metrics.
+    """
+
+    def send(self, metric_type, name, value, tags):
+        """
+        Record a metric.
+
+        Args:
+          metric_type: "timing" (value in milliseconds), "count" or "gauge"
+          name: the name of the metric, including the prefix
+          tags: dict of tags, e.g. {"block": "..."}
+        """
+        raise NotImplementedError
+
+
+class NullSink(MetricsSink):
+    """
+    Discard every metric.
+    """
+
+    def send(self, metric_type, name, value, tags):
+        pass
+
+
+class LoggingSink(MetricsSink):
+    """
+    Write every metric to a log, at INFO level.
+    """
+
+    def __init__(self, logger=log):
+        self.logger = logger
+
+    def send(self, metric_type, name, value, tags):
+        self.logger.info("%s %s=%s %s", metric_type, name, value,
+                         " ".join("{}={}".format(key, tags[key]) for key in sorted(tags)))
+
+
+class StatsdSink(MetricsSink):
+    """
+    Send every metric to a statsd server over UDP, with its tags in the
+    DogStatsD format. Metrics that can't be sent are dropped.
+    """
+
+    TYPES = {"timing": "ms", "count": "c", "gauge": "g"}
+
+    def __init__(self, host="localhost", port=8125):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def format(self, metric_type, name, value, tags):
+        """
+        Return the statsd datagram of a metric.
+        """
+        datagram = "{}:{}|{}".format(name, value, self.TYPES[metric_type])
+        if tags:
+            datagram += "|#" + ",".join("{}:{}".format(key, tags[key]) for key in sorted(tags))
+        return datagram
+
+    def send(self, metric_type, name, value, tags):
+        try:
+            self.socket.sendto(self.format(metric_type, name, value, tags).encode("utf8"), self.address)
+        except (socket.error, UnicodeError):
+            log.debug("Could not send metric %s to statsd", name, exc_info=True)
+
+
+class MemorySink(MetricsSink):
+    """
+    Keep every metric in memory, as a list of (metric_type, name, value,
+    tags), e.g. for tests and benchmarks.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+
+    def send(self, metric_type, name, value, tags):
+        with self.lock:
+            self.records.append((metric_type, name, value, tags))
+
+    def values(self, name):
+        """
+        Return the values recorded for a metric, oldest first.
+        """
+        with self.lock:
+            return [record[2] for record in self.records if record[1] == name]
+
+    def clear(self):
+        with self.lock:
+            del self.records[:]
+
+
+class Metrics(object):
+    """
+    Report the metrics of one block to a sink, with the block's tags.
+    """
+
+    def __init__(self, sink, tags=None):
+        self.sink = sink
+        self.tags = tags or {}
+        # metrics that are expensive to compute are skipped when nothing
+        # would receive them
+        self.enabled = not isinstance(sink, NullSink)
+
+    def timing(self, name, milliseconds):
+        self.sink.send("timing", METRICS_PREFIX + "." + name, round(milliseconds, 3), self.tags)
+
+    def count(self, name, value=1):
+        self.sink.send("count", METRICS_PREFIX + "." + name, value, self.tags)
+
+    def gauge(self, name, value):
+        self.sink.send("gauge", METRICS_PREFIX + "." + name, value, self.tags)
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_metrics_sink(settings):
+    """
+    Return the sink configured in the "CrowdsourceHinter" bucket of the
+    XBlock settings. Sinks are shared by every block of the process.
+    """
+    backend = settings.get("METRICS_BACKEND", "none")
+    key = (backend, settings.get("STATSD_HOST", "localhost"), settings.get("STATSD_PORT", 8125))
+    with _sinks_lock:
+        if key not in _sinks:
+            if backend == "none":
+                _sinks[key] = NullSink()
+            elif backend == "logging":
+                _sinks[key] = LoggingSink()
+            elif backend == "statsd":
+                _sinks[key] = StatsdSink(key[1], key[2])
+            elif backend == "memory":
+                _sinks[key] = MemorySink()
+            else:
+                raise ValueError("Unknown CrowdsourceHinter metrics backend: {}".format(backend))
+        return _sinks[key]
+
+
+def instrumented(handler=None, field_sizes=False):
+    """
+    Decorate a handler of CrowdsourceHinter to report its latency as
+    "handler.<name>". With field_sizes=True, the handler changes the
+    hint database and the size of its fields is reported afterwards.
+
+    Used as @instrumented or @instrumented(field_sizes=True).
+    """
+    if handler is None:
+        return functools.partial(instrumented, field_sizes=field_sizes)
+
+    @functools.wraps(handler)
+    def wrapper(block, data, suffix=''):
+        start = time.time()
+        try:
+            return handler(block, data, suffix)
+        finally:
+            block.metrics.timing("handler." + handler.__name__, 1000 * (time.time() - start))
+            if field_sizes:
+                block.report_field_sizes()
+    return wrapper
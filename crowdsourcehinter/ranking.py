@@ -0,0 +1,94 @@
+"""
+Helpers for ranking the hints of an incorrect answer by rating.
+
+A ranking is a plain list of hints ordered from the highest to the lowest
+score. Hints with equal scores keep the order in which they were given.
+"""
+from math import sqrt
+
+
+def net_rating(rating):
+    """
+    Return the net rating (upvotes minus downvotes) of a hint rating dict.
+    """
+    return rating["upvotes"] - rating["downvotes"]
+
+
+def build_ranking(hints, score):
+    """
+    Build a ranking from scratch out of an iterable of hints.
+    """
+    return sorted(hints, key=score, reverse=True)
+
+
+def wilson_lower_bound(upvotes, downvotes, z=1.96):
+    """
+    Return the lower bound of the Wilson score interval for the fraction
+    of positive votes. Hints with no votes score 0.
+    """
+    total = upvotes + downvotes
+    if total == 0:
+        return 0.0
+    positive = float(upvotes) / total
+    return ((positive + z * z / (2 * total) -
+             z * sqrt((positive * (1 - positive) + z * z / (4 * total)) / total)) /
+            (1 + z * z / total))
+
+
+# The number and fraction of positive imaginary votes every hint starts
+# with in its Bayesian average.
+BAYESIAN_PRIOR_VOTES = 4
+BAYESIAN_PRIOR_MEAN = 0.5
+
+
+def bayesian_average(upvotes, downvotes, prior_votes=BAYESIAN_PRIOR_VOTES, prior_mean=BAYESIAN_PRIOR_MEAN):
+    """
+    Return the fraction of positive votes, counting prior_votes imaginary
+    votes of which prior_mean are positive. Hints with few votes score
+    close to prior_mean.
+    """
+    return (upvotes + prior_votes * prior_mean) / float(upvotes + downvotes + prior_votes)
+
+
+# Scores used to rank the hints of an answer and to decide which hint
+# to evict from a full answer bucket. Each takes a rating dict
+# ({"upvotes": n, "downvotes": n}).
+RANKING_SCORES = {
+    "net_score": net_rating,
+    "wilson": lambda rating: wilson_lower_bound(rating["upvotes"], rating["downvotes"]),
+    "bayesian": lambda rating: bayesian_average(rating["upvotes"], rating["downvotes"]),
+}
+EVICTION_SCORES = RANKING_SCORES
+
+RANKING_POLICIES = ("net_score", "wilson", "bayesian")
+EVICTION_POLICIES = RANKING_POLICIES + ("oldest",)
+
+# Hints with fewer votes than this may be shown instead of the best
+# hint when exploration is enabled, so that they get rated.
+EXPLORATION_VOTES = 5
+
+
+def score_votes(policy, upvotes, downvotes):
+    """
+    Return the score of a hint with the given votes under a ranking
+    policy.
+    """
+    return RANKING_SCORES[policy]({"upvotes": upvotes, "downvotes": downvotes})
+
+
+def choose_eviction(hints, rating, policy):
+    """
+    Choose which hint to evict from a full answer bucket.
+
+    Args:
+      hints: the hints of the bucket, oldest first
+      rating: function returning the rating dict of a hint
+      policy: one of EVICTION_POLICIES
+
+    "oldest" evicts the hint that was added first; the other policies
+    evict the hint with the lowest score, the oldest one among ties.
+    """
+    if policy == "oldest":
+        return next(iter(hints))
+    score = EVICTION_SCORES[policy]
+    return min(hints, key=lambda hint: score(rating(hint)))
@@ -0,0 +1,56 @@
+"""
+Detection of near-duplicate hints.
+
+Hints are compared by the Jaccard similarity of the sets of trigrams of
+their normalized text (lowercased, without punctuation and extra
+whitespace). A new hint is compared to every hint of its answer, whose
+number is capped by hint_limit, so no index of the hints is kept.
+"""
+import unicodedata
+
+from .answers import trigrams
+
+
+def normalize_hint(hint):
+    """
+    Return the text of a hint lowercased, without punctuation and with
+    its words separated by single spaces.
+    """
+    hint = unicodedata.normalize("NFKC", hint).lower()
+    hint = "".join(" " if unicodedata.category(char).startswith("P") else char for char in hint)
+    return " ".join(hint.split())
+
+
+def similarity(first, second):
+    """
+    Return the Jaccard similarity of two sets.
+    """
+    if not first and not second:
+        return 1.0
+    return float(len(first & second)) / len(first | second)
+
+
+def find_similar_hint(hints, hint, threshold):
+    """
+    Return the hint among hints most similar to hint, if its similarity
+    is at least threshold, or None. A hint with the same normalized text
+    is always similar enough.
+
+    Args:
+      hints: the hints of the answer
+      hint: the new hint
+      threshold: the least similarity (0 to 1) of a near duplicate
+    """
+    normalized = normalize_hint(hint)
+    shingles = trigrams(normalized)
+    best, best_similarity = None, None
+    for candidate in sorted(hints):
+        candidate_normalized = normalize_hint(candidate)
+        if candidate_normalized == normalized:
+            return candidate
+        if threshold >= 1:
+            continue
+        candidate_similarity = similarity(shingles, trigrams(candidate_normalized))
+        if candidate_similarity >= threshold and (best is None or candidate_similarity > best_similarity):
+            best, best_similarity = candidate, candidate_similarity
+    return best
@@ -22,18 +22,198 @@ function CrowdsourceHinter(runtime, element, data){
     Logger.listen('seq_goto', null, stopScript);
 
     /**
-     * Get a hint from the server to show to the student after inc-orrectly answering a
-     * question. On success, continue to showHint.
+     * Hints already received, so that a student who submits the same incorrect answer again
+     * (e.g. clicking "Check" repeatedly) is shown its hint without another request. The cache
+     * is shared by every instance of the hinter for the block on the page (see stopScript), so
+     * that they also share requests still in flight. Hints expire after HINT_CACHE_TTL
+     * milliseconds, after which the server may choose a hint the student hasn't seen yet.
+     *   hints: {answer key: {"hint": get_hint result for one input, "time": ...}}
+     *   prefetched: {answer key: {"hint": ..., "time": ...}}, from prefetch_hints
+     *   pending: {request key: jqXHR of the get_hint request in flight}
+     *   shown: [answer, hint] pairs shown from prefetched hints, which the server hasn't recorded
+     */
+    var HINT_CACHE_TTL = 5 * 60 * 1000;
+    var getHintUrl = runtime.handlerUrl(element, 'get_hint');
+    CrowdsourceHinter.hintCaches = CrowdsourceHinter.hintCaches || {};
+    var hintCache = CrowdsourceHinter.hintCaches[getHintUrl] = CrowdsourceHinter.hintCaches[getHintUrl] ||
+        {hints: {}, prefetched: {}, pending: {}, shown: [], prefetching: false};
+    var latestRequestKey = null;
+
+    var PUNCTUATION = null;
+    try {
+        PUNCTUATION = new RegExp('\\p{P}', 'gu');
+    } catch (error) {
+        //older browsers can't match Unicode categories
+    }
+
+    /**
+     * Return the key of the hints of an answer, as the server does: the answer in canonical
+     * form, after the block's answer_canonicalization steps, and for the second and later
+     * inputs (or a first answer that looks like a namespace) in their own namespace. Steps that can't be done here (e.g. "numeric") stop the
+     * canonicalization, so that answers only share a key when they share a key on the server;
+     * such partial keys start with "~" and never match prefetched hints.
+     * @param answer is the answer to one input, as submitted
+     * @param position is the position of the input in the problem, from 0
+     */
+    function answerKey(answer, position){
+        var namespace = function(answer){
+            var named = position !== 0 || /^\[input \d+\] /.test(answer);
+            return named ? "[input " + (position + 1) + "] " + answer : answer;
+        };
+        var steps = data.answer_canonicalization || ["lowercase"];
+        for (var i = 0; i < steps.length; i++){
+            if (steps[i] === "unicode" && answer.normalize){
+                answer = answer.normalize("NFKC");
+            } else if (steps[i] === "lowercase"){
+                answer = answer.toLowerCase();
+            } else if (steps[i] === "whitespace"){
+                answer = $.trim(answer).split(/\s+/).join(" ");
+            } else if (steps[i] === "punctuation" && PUNCTUATION !== null){
+                answer = answer.replace(PUNCTUATION, "");
+            } else {
+                return "~" + i + ":" + namespace(answer);
+            }
+        }
+        return namespace(answer);
+    }
+
+    /**
+     * Return the inputs get_hint will look up for a submission, as {"id": input id, "answer":
+     * answer as submitted, "key": answer key}: the inputs graded incorrect, or every input if they can't be told apart.
+     * @param problemGradedEvent is data generated by the problem_graded event
+     */
+    function submittedInputs(problemGradedEvent){
+        var incorrect = incorrectInputs(problemGradedEvent);
+        var decode = function(text){ return decodeURIComponent(text.replace(/\+/g, ' ')); };
+        var pairs = $.grep(problemGradedEvent[0].split('&'), function(pair){ return pair !== ''; });
+        var inputs = [];
+        $.each(pairs, function(position, pair){
+            var separator = pair.indexOf('=');
+            var inputId = decode(separator === -1 ? pair : pair.slice(0, separator));
+            if (incorrect.length === 0 || $.inArray(inputId, incorrect) !== -1){
+                var answer = separator === -1 ? '' : decode(pair.slice(separator + 1));
+                inputs.push({"id": inputId, "answer": answer, "key": answerKey(answer, position)});
+            }
+        });
+        return inputs;
+    }
+
+    /**
+     * Return the cached hint for an input of submittedInputs, or null if there is none or it expired.
+     */
+    function cachedHint(input){
+        var now = new Date().getTime();
+        var key = input.key;
+        var cached = hintCache.hints[key];
+        if (cached && now - cached.time < HINT_CACHE_TTL){
+            return $.extend({}, cached.hint, {"StudentAnswer": input.answer, "InputId": input.id});
+        }
+        var prefetched = hintCache.prefetched[key];
+        if (prefetched && key.charAt(0) !== "~" && now - prefetched.time < HINT_CACHE_TTL){
+            return {"BestHint": prefetched.hint, "StudentAnswer": input.answer, "AnswerKey": key,
+                    "HintCategory": "ErrorResponse", "InputId": input.id};
+        }
+        return null;
+    }
+
+    /**
+     * Get a hint to show to the student after incorrectly answering a question, from the
+     * cache if every incorrect input has a hint there, or else from the server. On success,
+     * continue to showHint, unless the student has submitted again since.
      * @param problemGradedEvent is data generated by the problem_graded event
      */
     function getHint(problemGradedEvent){
         $(".crowdsourcehinter_block", element).show();
+        var inputs = submittedInputs(problemGradedEvent);
+        var requestKey = JSON.stringify($.map(inputs, function(input){ return [[input.id, input.key]]; }));
+        latestRequestKey = requestKey;
+        var hints = [];
+        $.each(inputs, function(index, input){
+            var hint = cachedHint(input);
+            if (hint !== null){
+                hints.push(hint);
+            }
+        });
+        if (inputs.length > 0 && hints.length === inputs.length){
+            $.each(inputs, function(index, input){
+                if (!hintCache.hints[input.key]){
+                    hintCache.shown.push([input.key, hints[index].BestHint]);
+                }
+            });
+            showHint($.extend({}, hints[0], {"Hints": hints}));
+            return;
+        }
+        var pending = hintCache.pending[requestKey];
+        if (!pending){
+            var request = {"submittedanswer": problemGradedEvent[0]};
+            var incorrect = incorrectInputs(problemGradedEvent);
+            if (incorrect.length > 0){
+                request.incorrect_inputs = incorrect;
+            }
+            pending = hintCache.pending[requestKey] = $.ajax({
+                type: "POST",
+                url: getHintUrl,
+                data: JSON.stringify(request)
+            });
+            pending.done(function(result){
+                var keys = {};
+                $.each(inputs, function(index, input){ keys[input.id] = input.key; });
+                $.each(result.Hints || [], function(index, hint){
+                    if (keys.hasOwnProperty(hint.InputId)){
+                        hintCache.hints[keys[hint.InputId]] = {"hint": hint, "time": new Date().getTime()};
+                    }
+                });
+            }).always(function(){
+                delete hintCache.pending[requestKey];
+            });
+        }
+        pending.done(function(result){
+            if (latestRequestKey === requestKey){
+                showHint(result);
+            }
+        });
+    }
+
+    /**
+     * Load the hints of the most common incorrect answers, if the block prefetches them.
+     * Only done once per page, and not when answers can't be canonicalized here exactly.
+     */
+    function prefetchHints(){
+        if (!data.prefetch || hintCache.prefetching || answerKey("", 0).charAt(0) === "~"){
+            return;
+        }
+        hintCache.prefetching = true;
         $.ajax({
             type: "POST",
-            url: runtime.handlerUrl(element, 'get_hint'),
-            data: JSON.stringify({"submittedanswer": problemGradedEvent[0]}),
-            success: showHint
+            url: runtime.handlerUrl(element, 'prefetch_hints'),
+            data: JSON.stringify({}),
+            success: function(result){
+                var now = new Date().getTime();
+                $.each(result.hints, function(answer, hint){
+                    hintCache.prefetched[answer] = {"hint": hint, "time": now};
+                });
+            }
+        });
+    }
+    prefetchHints();
+
+    /**
+     * Find the inputs of a problem with several inputs that were graded incorrect,
+     * from the status element the problem renders next to each input. This is as
+     * brittle as checkIsAnswerCorrect; an empty list means they couldn't be told apart.
+     * @param problemGradedEventData is the data from problem_graded event.
+     */
+    function incorrectInputs(problemGradedEventData){
+        var problemHtml = $('<div>').append($.parseHTML(problemGradedEventData[1]));
+        var incorrect = [];
+        $.each(problemGradedEventData[0].split('&'), function(index, pair){
+            var inputId = decodeURIComponent(pair.split('=')[0].replace(/\+/g, ' '));
+            var status = problemHtml.find('[id="status_' + inputId.replace(/^input_/, '') + '"]');
+            if (status.hasClass('incorrect')){
+                incorrect.push(inputId);
+            }
         });
+        return incorrect;
     }
 
     /**
@@ -45,12 +225,15 @@ function CrowdsourceHinter(runtime, element, data){
     function startHintRating(){
         $('.csh_correct', element).show();
         $(".csh_hint_reveal", element).hide();
+        //the server forgets the hints shown for the problem once it is answered correctly
+        var shown = hintCache.shown;
+        hintCache.shown = [];
+        hintCache.hints = {};
         if($('.csh_hint_creation', element)){
-        //send empty data for ajax call because not having a data field causes error
             $.ajax({
                 type: "POST",
                 url: runtime.handlerUrl(element, 'get_used_hint_answer_data'),
-                data: JSON.stringify({}),
+                data: JSON.stringify({"shown": shown}),
                 success: setHintRatingUX
             });
         }
@@ -79,7 +262,7 @@ function CrowdsourceHinter(runtime, element, data){
      */
     function onStudentSubmission(){ return function(event_type, data, element){
         //search method of correctness of problem is brittle
-        if (checkIsAnswerCorrect(data)){
+        if (checkIsAnswerCorrect(data) && incorrectInputs(data).length === 0){
             startHintRating();
         } else { //if the submitted answer is incorrect
             getHint(data);
@@ -103,12 +286,21 @@ function CrowdsourceHinter(runtime, element, data){
      * Modify csh_hint_text attributes to show hint to the student.
      */
     function showHint(result){
-        $('.csh_hint_text', element).attr('student_answer', result.StudentAnswer);
+        $('.csh_hint_text', element).attr('student_answer', result.AnswerKey);
         $('.csh_hint_text', element).attr('hint_received', result.BestHint);
         $('.csh_hint_text', element).text("Hint: " + result.BestHint);
+        //in a problem with several inputs, the hints for the other incorrect inputs follow
+        $('.csh_input_hint', element).remove();
+        var previous = $('.csh_hint_text', element);
+        $.each((result.Hints || []).slice(1), function(index, hint){
+            var inputHint = $('<div class="csh_input_hint">').text("Hint: " + hint.BestHint);
+            previous.after(inputHint);
+            previous = inputHint;
+        });
         $('.csh_rate_hint_completed', element).attr('class', 'csh_rate_hint');
         $('.csh_hint_text', element).attr('rating', '');
-        Logger.log('crowd_hinter.showHint', {"student_answer": result.StudentAnswer, "hint_received": result.Hints});
+        Logger.log('crowd_hinter.showHint', {"student_answer": result.StudentAnswer, "answer_key": result.AnswerKey,
+                                             "hint_received": result.BestHint, "hints": result.Hints});
     }
 
     /**
@@ -133,11 +325,57 @@ function CrowdsourceHinter(runtime, element, data){
      * only can be moderated after being reported, so unreported hints will stay in the system.
      * @param reportedHint is the reported hint text
      */
-    function showReportedModeration(reportedHint){
-        var reportedModerationTemplate = $(Mustache.render($('#show_reported_moderation').html(), {reportedHintIdentifier: encodeURI(reportedHint), reportedHintText: reportedHint}));
-        $('.csh_reported_hints', element).append(reportedModerationTemplate);
+    function showReportedModeration(reported){
+        var reportedModerationTemplate = $(Mustache.render($('#show_reported_moderation').html(), {
+            reportedHintIdentifier: encodeURI(reported.hint),
+            reportedHintText: reported.hint,
+            reportedAnswerIdentifier: encodeURI(reported.answer),
+            reportedAnswerText: reported.answer,
+            upvotes: reported.upvotes,
+            downvotes: reported.downvotes
+        }));
+        $('.csh_reported_list', element).append(reportedModerationTemplate);
     }
 
+    /**
+     * Cursor of the next page of reported hints, or null if there are no more.
+     */
+    var reportedHintsCursor = null;
+
+    /**
+     * Load a page of reported hints for staff to moderate, filtered and sorted as chosen
+     * in the moderation area. Pages are loaded when asked for, so that courses with many
+     * reported hints don't send them all at once.
+     * @param firstPage is true to start over from the first page, false to load the next one
+     */
+    function loadReportedHints(firstPage){
+        if(firstPage){
+            reportedHintsCursor = null;
+            $('.csh_reported_list', element).empty();
+        }
+        $.ajax({
+            type: "POST",
+            url: runtime.handlerUrl(element, 'reported_hints_page'),
+            data: JSON.stringify({
+                "answer": $('.csh_reported_answer', element).val(),
+                "sort": $('.csh_reported_sort', element).val(),
+                "cursor": reportedHintsCursor
+            }),
+            success: function(result) {
+                if(!result.success){
+                    return;
+                }
+                $.each(result.hints, function(index, reported) {
+                    showReportedModeration(reported);
+                });
+                reportedHintsCursor = result.next_cursor;
+                $('.csh_reported_more', element).toggle(reportedHintsCursor !== null);
+            }
+        });
+    }
+    $(element).on('click', '.csh_reported_apply', function(){ loadReportedHints(true); });
+    $(element).on('click', '.csh_reported_more', function(){ loadReportedHints(false); });
+
     /**
      * Append new divisions into html for each answer the student submitted before correctly 
      * answering the question. showStudentHintRatingUX appends new hints into these divs.
@@ -160,28 +398,21 @@ function CrowdsourceHinter(runtime, element, data){
     function setHintRatingUX(result){
         if(data.isStaff){ //allow staff to see and remove/return reported hints to/from the hint pool for a problem
             $('.crowdsourcehinter_block', element).attr('class', 'crowdsourcehinter_block_is_staff');
-            $.each(result, function(index, value) {
-                if(value == "Reported") {
-                    //index represents the reported hint's text
-                    showReportedModeration(index);
-                }
-            });
+            loadReportedHints(true);
         }
         $.each(result, function(index, value) {
-            if(value != "Reported"){
-                showStudentSubmissionHistory(value);
-                student_answer = value;
-                hint = index;
-                //hints return null if no answer-specific hints exist
-                if(hint === "null") {
-                    var noHintsTemplate = $(Mustache.render($('#show_no_hints').html(), {}));
-                    $('.csh_student_answer', element).append(noHintsTemplate);
-                    var hintCreationTemplate = $(Mustache.render($('#add_hint_creation').html(), {}));
-                    $('.csh_student_answer', element).append(hintCreationTemplate);
-                    Logger.log("crowd_hinter.hint_rating_UX", {"hint": "null", "student_answer": student_answer});
-                } else {
-                    showStudentHintRatingUX(hint, student_answer);
-                }
+            showStudentSubmissionHistory(value);
+            student_answer = value;
+            hint = index;
+            //hints return null if no answer-specific hints exist
+            if(hint === "null") {
+                var noHintsTemplate = $(Mustache.render($('#show_no_hints').html(), {}));
+                $('.csh_student_answer', element).append(noHintsTemplate);
+                var hintCreationTemplate = $(Mustache.render($('#add_hint_creation').html(), {}));
+                $('.csh_student_answer', element).append(hintCreationTemplate);
+                Logger.log("crowd_hinter.hint_rating_UX", {"hint": "null", "student_answer": student_answer});
+            } else {
+                showStudentHintRatingUX(hint, student_answer);
             }
         });
     }
@@ -223,10 +454,14 @@ function CrowdsourceHinter(runtime, element, data){
                 type: "POST",
                 url: runtime.handlerUrl(element, 'add_new_hint'),
                 data: JSON.stringify({"new_hint_submission": newHint, "answer": studentAnswer}),
-                success: function() {
+                success: function(result) {
                     $('.csh_student_text_input', element).attr('style', 'display: none;');
                     $(submitHintButtonHTML.currentTarget).attr('style', 'display: none;');
-                    $('.csh_hint_value', element).append("<br>Thankyou!");
+                    if (result.success === false){
+                        $('.csh_hint_value', element).append($('<div>').text(result.error));
+                    } else {
+                        $('.csh_hint_value', element).append("<br>Thankyou!");
+                    }
                     Logger.log('crowd_hinter.submitNewHint', {"student_answer": studentAnswer, "new_hint_submission": newHint})
                 }
             });
@@ -234,6 +469,52 @@ function CrowdsourceHinter(runtime, element, data){
     }}
     $(element).on('click', '.csh_submit_new', submitNewHint($(this)));
 
+    /**
+     * Ratings waiting to be sent to the server. Ratings made within RATING_BATCH_DELAY
+     * milliseconds of each other (e.g. staff moderating several reported hints) are sent
+     * together to the rate_hints handler, so the hint database is saved once for all of them.
+     */
+    var RATING_BATCH_DELAY = 500;
+    var queuedRatings = [];
+    var queuedRatingCallbacks = [];
+    var ratingTimer = null;
+
+    /**
+     * Queue a rating to be sent to the server with the next batch.
+     * @param rating is {"student_rating": ..., "hint": ..., "student_answer": ...}
+     * @param callback is called with the result of the rating, as rate_hint returns it
+     */
+    function queueRating(rating, callback){
+        queuedRatings.push(rating);
+        queuedRatingCallbacks.push(callback);
+        if(ratingTimer === null){
+            ratingTimer = setTimeout(sendQueuedRatings, RATING_BATCH_DELAY);
+        }
+    }
+
+    /**
+     * Send every queued rating to the rate_hints handler in one request.
+     */
+    function sendQueuedRatings(){
+        var ratings = queuedRatings;
+        var callbacks = queuedRatingCallbacks;
+        queuedRatings = [];
+        queuedRatingCallbacks = [];
+        ratingTimer = null;
+        $.ajax({
+            type: "POST",
+            url: runtime.handlerUrl(element, 'rate_hints'),
+            data: JSON.stringify({"ratings": ratings}),
+            success: function(result) {
+                $.each(callbacks, function(index, callback) {
+                    if(callback){
+                        callback(result.results ? result.results[index] : result);
+                    }
+                });
+            }
+        });
+    }
+
     /**
      * Send vote data to modify a hint's rating (or mark it as reported). Triggered by
      * clicking a button to upvote, downvote, or report the hint (both before and after
@@ -249,14 +530,9 @@ function CrowdsourceHinter(runtime, element, data){
         //arise in answers that contain spaces. Since the original answer is not in the encoded form,
         //we must use the decoded form here.
         student_answer = decodeURI($('.csh_hint_text', element).attr('student_answer'));
-        $.ajax({
-            type: "POST",
-            url: runtime.handlerUrl(element, 'rate_hint'),
-            data: JSON.stringify({"student_rating": rating, "hint": hint, "student_answer": student_answer}),
-            success: function() {
-                Logger.log('crowd_hinter.rateHint', {"hint": hint, "student_answer": student_answer, "rating": rating})
-                $('.csh_rate_hint', element).attr('class', 'csh_rate_hint_completed');
-            }
+        queueRating({"student_rating": rating, "hint": hint, "student_answer": student_answer}, function() {
+            Logger.log('crowd_hinter.rateHint', {"hint": hint, "student_answer": student_answer, "rating": rating})
+            $('.csh_rate_hint', element).attr('class', 'csh_rate_hint_completed');
         });
     }}
     $(element).on('click', '.csh_rate_hint', rateHint($(this)));
@@ -269,13 +545,8 @@ function CrowdsourceHinter(runtime, element, data){
         student_answer = decodeURI($('.csh_hint_text', element).attr('student_answer'));
         $('.csh_hint_text', element).text('This hint has been reported for review.');
         $('.csh_hint', element).text('This hint has been reported for review.');
-        $.ajax({
-            type: "POST",
-            url: runtime.handlerUrl(element, 'rate_hint'),
-            data: JSON.stringify({"student_rating": "report", "hint": hint, "student_answer": student_answer}),
-            success: function() {
-                    Logger.log('crowd_hinter.reportHint', {"hint": hint, "student_answer": student_answer})
-                }
+        queueRating({"student_rating": "report", "hint": hint, "student_answer": student_answer}, function() {
+            Logger.log('crowd_hinter.reportHint', {"hint": hint, "student_answer": student_answer})
         });
     }}
     $(element).on('click', '.csh_report_hint', reportHint($(this)));
@@ -285,7 +556,7 @@ function CrowdsourceHinter(runtime, element, data){
      * are removed from the moderation area regardless of whether they are to be permanently removed
      * from the hint pool or not. Called by staffRateHint.
      */
-    function removeReportedHint(){
+    function removeReportedHint(hint, student_answer, rating){
         Logger.log('crowd_hinter.staffRateHint', {"hint": hint, "student_answer": student_answer, "rating": rating});
         $(".csh_hint_value[value='" + hint + "']", element).remove();
     }
@@ -298,13 +569,11 @@ function CrowdsourceHinter(runtime, element, data){
     function staffRateHint(){ return function(staffRateHintButtonHTML){
         hint = $(staffRateHintButtonHTML.currentTarget).parent().find(".csh_hint").text();
         rating = staffRateHintButtonHTML.currentTarget.attributes['data-rate'].value
-        student_answer = "Reported";
+        student_answer = decodeURI($(staffRateHintButtonHTML.currentTarget).parent().attr('data-answer'));
         Logger.log('crowd_hinter.staff_rate_hint', {"hint": hint, "student_answer": student_answer, "rating": rating});
-        $.ajax({
-            type: "POST",
-            url: runtime.handlerUrl(element, 'rate_hint'),
-            data: JSON.stringify({"student_rating": rating, "hint": hint, "student_answer": student_answer}),
-            success: removeReportedHint()
+        var staffHint = hint, staffAnswer = student_answer, staffRating = rating;
+        queueRating({"student_rating": rating, "hint": hint, "student_answer": student_answer}, function() {
+            removeReportedHint(staffHint, staffAnswer, staffRating);
         });
     }}
     $(element).on('click', '.csh_staff_rate', staffRateHint($(this)));
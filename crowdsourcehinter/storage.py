@@ -0,0 +1,1148 @@
+"""
+Storage backends for the crowdsourced hint data of a CrowdsourceHinter.
+
+The hinter reads and writes its hints, ratings and reports through a
+HintStore. FieldHintStore keeps everything in the block's XBlock fields
+(the default), and SQLiteHintStore keeps it in indexed tables of a local
+SQLite database, so that a request only reads and writes the rows it
+needs instead of (de)serializing the whole hint database.
+
+The backend is chosen in the XBlock settings of the platform, e.g.:
+
+    XBLOCK_SETTINGS = {
+        "CrowdsourceHinter": {
+            "STORAGE_BACKEND": "sqlite",
+            "SQLITE_PATH": "/edx/var/crowdsourcehinter/hints.db",
+        }
+    }
+"""
+import base64
+import contextlib
+import hashlib
+import heapq
+import json
+import random
+import sqlite3
+import threading
+import time
+
+import six
+
+from .ranking import EXPLORATION_VOTES, RANKING_SCORES, build_ranking, choose_eviction, score_votes
+
+# The current version of the encoding of the fields used by
+# FieldHintStore, see CrowdsourceHinter.hint_database_format.
+HINT_DATABASE_FORMAT = 2
+
+# The number of incorrect answers without hints whose frequency is
+# tracked, see HintStore.record_unhinted_answer.
+UNHINTED_ANSWER_LIMIT = 100
+
+# The number of incorrect answers whose hints have the most votes that
+# FieldHintStore keeps track of, see HintStore.popular_answers.
+POPULAR_ANSWER_LIMIT = 100
+
+# The fraction of the submissions of incorrect answers without hints
+# that FieldHintStore counts, so that most of them don't write the
+# unhinted_answers field shared by every student.
+UNHINTED_ANSWER_SAMPLE_RATE = 0.1
+
+# The orders in which reported hints can be listed: by the time they
+# were reported or by their net rating, "-" for the reverse order.
+REPORT_SORTS = ("time", "-time", "score", "-score")
+
+
+def report_sort_key(item, sort):
+    """
+    Return the key ordering a reported hint ({"answer", "hint",
+    "upvotes", "downvotes", "reported_at"}) in a list of reported hints.
+    Ties are broken by answer and hint, so keys are unique.
+    """
+    sign = -1 if sort.startswith("-") else 1
+    if sort.lstrip("-") == "time":
+        value = item["reported_at"]
+    else:
+        value = item["upvotes"] - item["downvotes"]
+    return [sign * value, item["answer"], item["hint"]]
+
+
+def encode_cursor(key):
+    """
+    Return an opaque cursor for the sort key of the last item of a page.
+    """
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """
+    Return the sort key encoded in a cursor. Raises ValueError if the
+    cursor is invalid.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf8"))
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    # a sort key is [number, answer, hint], see report_sort_key
+    if (not isinstance(key, list) or len(key) != 3 or isinstance(key[0], bool) or
+            not isinstance(key[0], six.integer_types + (float,)) or
+            not all(isinstance(text, six.string_types) for text in key[1:])):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def page_with_cursor(page, sort, limit):
+    """
+    Split the first limit + 1 items of a list into a page of limit items
+    and the cursor of the next page, if there is one.
+    """
+    if len(page) > limit:
+        page = page[:limit]
+        return page, encode_cursor(report_sort_key(page[-1], sort))
+    return page, None
+
+
+def hint_key(hint):
+    """
+    Return the key identifying a hint of an answer in the fields other
+    than hint_database, derived from the hint's text.
+    """
+    return hashlib.sha1(six.text_type(hint).encode("utf8")).hexdigest()[:16]
+
+
+def count_frequent(counts, item, limit, amount=1):
+    """
+    Count amount occurrences of item in counts ({item: count}), keeping
+    at most limit items.
+
+    This is the Space-Saving algorithm: when counts is full, the least
+    frequent item is replaced by the new one, which inherits its count.
+    The most frequent items are kept, with counts that overestimate
+    them by at most the count of the item they replaced.
+    """
+    if item in counts:
+        counts[item] += amount
+    elif len(counts) < limit:
+        counts[item] = amount
+    else:
+        least = min(counts, key=counts.get)
+        counts[item] = counts.pop(least) + amount
+
+
+class HintStore(object):
+    """
+    Interface of the storage of crowdsourced hints for one hinter block.
+
+    Hints belong to an incorrect answer. Each hint has a rating
+    ({"upvotes": n, "downvotes": n}) and may be reported, in which case it
+    is not shown to students.
+    """
+
+    # The number of hints read by the last call of best_hint.
+    hints_scanned = 0
+
+    # The fraction of the submissions of unhinted answers that are
+    # counted, see record_unhinted_answer.
+    unhinted_sample_rate = 1.0
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Group the changes made inside the context, so that they are all
+        saved at its end, or none of them if it raises. Transactions may
+        be nested; only the outermost one saves.
+        """
+        yield
+
+    def seeded_version(self):
+        """
+        Return the version of the initial hints last merged by seed.
+        """
+        raise NotImplementedError
+
+    def seed(self, initial_hints, version):
+        """
+        Merge initial hints ({"answer": ["hint", ...]}) into the store and
+        remember their version. Hints already stored keep their ratings.
+        """
+        raise NotImplementedError
+
+    def has_hint(self, answer, hint):
+        """
+        Return whether the hint is stored for the incorrect answer.
+        """
+        raise NotImplementedError
+
+    def answers(self):
+        """
+        Return the incorrect answers that have hints.
+        """
+        raise NotImplementedError
+
+    def answers_version(self):
+        """
+        Return a value that changes whenever an incorrect answer gets its
+        first hint or loses its last one.
+        """
+        raise NotImplementedError
+
+    def rating(self, answer, hint):
+        """
+        Return the rating of a hint as {"upvotes": n, "downvotes": n}.
+        """
+        raise NotImplementedError
+
+    def ranked_hints(self, answer):
+        """
+        Return the hints of an incorrect answer, best rated first.
+        """
+        raise NotImplementedError
+
+    def available_hints(self, answer):
+        """
+        Return the hints of an incorrect answer that have not been
+        reported, oldest first.
+        """
+        raise NotImplementedError
+
+    def best_hint(self, answer, skip=()):
+        """
+        Return the best rated hint of an incorrect answer that has not
+        been reported and is not in skip, or None.
+        """
+        raise NotImplementedError
+
+    def explore_hint(self, answer, skip=()):
+        """
+        Return a random hint of an incorrect answer with fewer than
+        EXPLORATION_VOTES votes that has not been reported and is not in
+        skip, or None.
+        """
+        raise NotImplementedError
+
+    def rebuild_rankings(self):
+        """
+        Score every hint again with the store's ranking policy, for stores
+        that keep the scores of hints rather than computing them when
+        the hints are read.
+        """
+        raise NotImplementedError
+
+    def popular_answers(self, limit):
+        """
+        Return up to limit incorrect answers whose hints have votes, the
+        answers whose hints have the most votes first.
+        """
+        raise NotImplementedError
+
+    def available_hint_count(self, answer):
+        """
+        Return the number of hints of an incorrect answer that have not
+        been reported.
+        """
+        raise NotImplementedError
+
+    def available_hint_counts(self, answers):
+        """
+        Return a dict of the number of hints of each of several incorrect
+        answers that have not been reported.
+        """
+        return dict((answer, self.available_hint_count(answer)) for answer in answers)
+
+    def add_hint(self, answer, hint):
+        """
+        Add a hint with no votes to an incorrect answer, then evict hints
+        if the answer has too many. The new hint has had no chance to be
+        voted on yet, so it is only evicted if the hint limit leaves no
+        room for it.
+
+        Returns:
+          the list of hints that were evicted
+        """
+        raise NotImplementedError
+
+    def import_hint(self, answer, hint, upvotes, downvotes):
+        """
+        Add a hint to an incorrect answer if it doesn't have it yet, merge
+        the given votes into its rating by keeping the larger of the
+        stored and the given count of each kind, then evict hints if the
+        answer has too many. Importing the same hint again changes nothing.
+
+        Returns:
+          the list of hints that were evicted
+        """
+        raise NotImplementedError
+
+    def iter_hints(self):
+        """
+        Iterate over every hint as (answer, hint, rating, reported),
+        without loading them all at once where the store allows it.
+        """
+        raise NotImplementedError
+
+    def limit_hints(self, answer, keep=()):
+        """
+        Evict hints until the incorrect answer has no more hints than the
+        store's hint limit. The hints in keep are only evicted once every
+        other hint has been.
+
+        Returns:
+          the list of hints that were evicted
+        """
+        raise NotImplementedError
+
+    def remove_hint(self, answer, hint):
+        """
+        Remove a hint, along with its votes.
+        """
+        raise NotImplementedError
+
+    def vote(self, answer, hint, vote):
+        """
+        Add a vote ("upvotes" or "downvotes") to a hint.
+        """
+        raise NotImplementedError
+
+    def record_unhinted_answer(self, answer):
+        """
+        Count a submission of an incorrect answer that has no hints to
+        show. Only the most frequent such answers are kept.
+
+        Only a random sample of unhinted_sample_rate of the submissions
+        is counted, each as 1 / unhinted_sample_rate submissions.
+        """
+        if self.unhinted_sample_rate >= 1 or random.random() < self.unhinted_sample_rate:
+            self.count_unhinted_answer(answer, int(round(1 / self.unhinted_sample_rate)))
+
+    def count_unhinted_answer(self, answer, count):
+        """
+        Add count submissions to an incorrect answer that has no hints to
+        show, see record_unhinted_answer.
+        """
+        raise NotImplementedError
+
+    def unhinted_answers(self):
+        """
+        Return the most frequent incorrect answers without hints, as a
+        list of (answer, count), most frequent first.
+        """
+        raise NotImplementedError
+
+    def reported_hints(self):
+        """
+        Return the reported hints as {"answer": ["hint", ...]}.
+        """
+        raise NotImplementedError
+
+    def is_reported(self, answer, hint):
+        """
+        Return whether a hint has been reported for an incorrect answer.
+        """
+        raise NotImplementedError
+
+    def reported_answers(self, hint):
+        """
+        Return the incorrect answers a hint has been reported for.
+        """
+        raise NotImplementedError
+
+    def report(self, answer, hint):
+        """
+        Mark a hint of an incorrect answer as reported, so that it is not
+        shown for that answer.
+
+        Returns:
+          False if the answer has no such hint, True otherwise
+        """
+        raise NotImplementedError
+
+    def unreport(self, answer, hint):
+        """
+        Return a hint reported for an incorrect answer to use.
+        """
+        raise NotImplementedError
+
+    def reported_hints_page(self, answer=None, sort="time", cursor=None, limit=20):
+        """
+        Return a page of the reported hints, as a list of {"answer",
+        "hint", "upvotes", "downvotes", "reported_at"} dicts, and the
+        cursor of the next page (None after the last page).
+
+        Args:
+          answer: only list the hints reported for this answer
+          sort: one of REPORT_SORTS
+          cursor: the cursor returned with the previous page
+          limit: the number of hints per page
+        """
+        raise NotImplementedError
+
+    def field_sizes(self):
+        """
+        Return the serialized size in bytes of the block fields holding
+        the hints, as {"field": bytes}. Stores that don't keep hints in
+        fields return {}.
+        """
+        return {}
+
+
+class FieldHintStore(HintStore):
+    """
+    Store hints in the user_state_summary fields of a CrowdsourceHinter:
+    hint_database, reported_hints, report_times, unhinted_answers and
+    popular_answers.
+
+    hint_database keeps the text of each hint in its answer's bucket.
+    The other fields refer to a hint of an answer by its key, a hash of
+    its text (see hint_key), so that a reference can only ever name
+    that text. Fields in older encodings are upgraded when the store is
+    created.
+
+    The fields are saved whole, and the last request to save a field
+    overwrites the changes other requests made to it in the meantime.
+    Votes, hints and reports made at the same time are lost that way
+    under concurrent use; SQLiteHintStore applies every change
+    atomically and is the backend to use where they must not be lost.
+    Since the fields may be saved by different requests, references to
+    hints that are no longer in hint_database are ignored.
+
+    The hints of an answer are ranked from their ratings when they are
+    read, so that a vote only changes the hint's entry.
+    """
+
+    def __init__(self, block, hint_limit=10, eviction_policy="net_score", ranking_policy="net_score",
+                 unhinted_limit=UNHINTED_ANSWER_LIMIT, unhinted_sample_rate=UNHINTED_ANSWER_SAMPLE_RATE):
+        self.block = block
+        self.hint_limit = hint_limit
+        self.eviction_policy = eviction_policy
+        self.ranking_policy = ranking_policy
+        self.unhinted_limit = unhinted_limit
+        self.unhinted_sample_rate = unhinted_sample_rate
+        if block.hint_database_format < HINT_DATABASE_FORMAT:
+            self.upgrade()
+
+    def upgrade(self):
+        """
+        Convert the fields from the encoding keyed by hint text (format
+        1) to the current encoding.
+
+        A report used to hide the hint's text for every answer, so it is
+        kept for every answer that has the hint.
+        """
+        block = self.block
+        hint_database = {}
+        for answer, bucket in block.hint_database.items():
+            # answers without hints used to get an empty bucket; they
+            # are now only counted in unhinted_answers
+            if bucket:
+                hint_database[answer] = [[hint, rating["upvotes"], rating["downvotes"]]
+                                         for hint, rating in bucket.items()]
+        block.hint_database = hint_database
+        votes = dict((answer, sum(entry[1] + entry[2] for entry in bucket))
+                     for answer, bucket in hint_database.items())
+        block.popular_answers = dict(heapq.nlargest(POPULAR_ANSWER_LIMIT,
+                                                    [item for item in votes.items() if item[1] > 0],
+                                                    key=lambda item: item[1]))
+        self.upgrade_reports(block.reported_hints)
+        block.hint_database_format = HINT_DATABASE_FORMAT
+
+    def upgrade_reports(self, reported_hints):
+        """
+        Report every hint of reported_hints ({"hint": "answer"}) for every
+        answer that has it.
+        """
+        block = self.block
+        block.reported_hints = {}
+        for answer, bucket in block.hint_database.items():
+            reported = [hint_key(entry[0]) for entry in bucket if entry[0] in reported_hints]
+            if reported:
+                block.reported_hints[answer] = reported
+
+    def entry(self, answer, hint):
+        """
+        Return the [hint, upvotes, downvotes] entry of a hint in an
+        answer's bucket, or None.
+        """
+        for entry in self.block.hint_database.get(answer, ()):
+            if entry[0] == hint:
+                return entry
+        return None
+
+    def reported_keys(self, answer):
+        """
+        Return the set of the keys of the hints reported for an answer.
+        """
+        return set(self.block.reported_hints.get(answer, ()))
+
+    def seeded_version(self):
+        return self.block.seeded_initial_hints_version
+
+    def seed(self, initial_hints, version):
+        for answer, hints in initial_hints.items():
+            self.add_answer(answer)
+            for hint in hints:
+                if not self.has_hint(answer, hint):
+                    self.add_hint(answer, hint)
+        self.block.seeded_initial_hints_version = version
+
+    def add_answer(self, answer):
+        """
+        Add an empty bucket for an incorrect answer that is about to
+        receive a hint.
+        """
+        if answer not in self.block.hint_database:
+            self.block.hint_database[answer] = []
+            self.block.hint_answers_version += 1
+
+    def answers(self):
+        return list(self.block.hint_database)
+
+    def answers_version(self):
+        return self.block.hint_answers_version
+
+    def has_hint(self, answer, hint):
+        return self.entry(answer, hint) is not None
+
+    def rating(self, answer, hint):
+        return self.ratings(answer)[hint]
+
+    def ratings(self, answer):
+        """
+        Return the rating of every hint of an answer, as
+        {"hint": {"upvotes": n, "downvotes": n}}.
+        """
+        return dict((hint, {"upvotes": upvotes, "downvotes": downvotes})
+                    for hint, upvotes, downvotes in self.block.hint_database.get(answer, ()))
+
+    def ranked_hints(self, answer):
+        # hints with equal scores keep the order in which they were added
+        ratings = self.ratings(answer)
+        score = RANKING_SCORES[self.ranking_policy]
+        return build_ranking([entry[0] for entry in self.block.hint_database.get(answer, ())],
+                             lambda hint: score(ratings[hint]))
+
+    def available_hints(self, answer):
+        reported = self.reported_keys(answer)
+        return [entry[0] for entry in self.block.hint_database.get(answer, ()) if hint_key(entry[0]) not in reported]
+
+    def best_hint(self, answer, skip=()):
+        # the ranking is ordered best first, so the first hint that has
+        # not been reported (or skipped) is the best one
+        reported = self.reported_keys(answer)
+        skip = set(skip)
+        self.hints_scanned = 0
+        for hint in self.ranked_hints(answer):
+            self.hints_scanned += 1
+            if hint not in skip and hint_key(hint) not in reported:
+                return hint
+        return None
+
+    def explore_hint(self, answer, skip=()):
+        reported = self.reported_keys(answer)
+        skip = set(skip)
+        ratings = self.ratings(answer)
+        candidates = [entry[0] for entry in self.block.hint_database.get(answer, ())
+                      if entry[0] not in skip and hint_key(entry[0]) not in reported and
+                      ratings[entry[0]]["upvotes"] + ratings[entry[0]]["downvotes"] < EXPLORATION_VOTES]
+        return random.choice(candidates) if candidates else None
+
+    def rebuild_rankings(self):
+        # hints are ranked when they are read
+        pass
+
+    def popular_answers(self, limit):
+        counts = self.block.popular_answers
+        answers = [answer for answer in counts if answer in self.block.hint_database]
+        return heapq.nsmallest(limit, answers, key=lambda answer: (-counts[answer], answer))
+
+    def count_votes(self, answer, votes):
+        """
+        Add votes (fewer than 0 when hints are removed) to the count of
+        an incorrect answer in popular_answers, which keeps the
+        POPULAR_ANSWER_LIMIT answers with the most votes.
+        """
+        counts = self.block.popular_answers
+        if votes > 0:
+            count_frequent(counts, answer, POPULAR_ANSWER_LIMIT, votes)
+        elif votes < 0 and answer in counts:
+            counts[answer] += votes
+            if counts[answer] <= 0:
+                del counts[answer]
+
+    def available_hint_count(self, answer):
+        bucket = self.block.hint_database.get(answer, ())
+        reported = self.reported_keys(answer)
+        if not reported:
+            return len(bucket)
+        return sum(1 for entry in bucket if hint_key(entry[0]) not in reported)
+
+    def add_hint(self, answer, hint):
+        self.put_hint(answer, hint)
+        return self.limit_hints(answer, keep=(hint,))
+
+    def import_hint(self, answer, hint, upvotes, downvotes):
+        self.put_hint(answer, hint, upvotes, downvotes)
+        return self.limit_hints(answer)
+
+    def put_hint(self, answer, hint, upvotes=None, downvotes=None):
+        """
+        Add a hint with no votes to an incorrect answer if it doesn't have
+        it yet, and raise each count of its rating to the given votes if
+        they are larger.
+        """
+        self.add_answer(answer)
+        entry = self.entry(answer, hint)
+        if entry is None:
+            entry = [hint, 0, 0]
+            self.block.hint_database[answer].append(entry)
+        if upvotes is not None:
+            upvotes, downvotes = max(entry[1], upvotes), max(entry[2], downvotes)
+            self.count_votes(answer, upvotes + downvotes - entry[1] - entry[2])
+            entry[1], entry[2] = upvotes, downvotes
+        self.block.unhinted_answers.pop(answer, None)
+
+    def iter_hints(self):
+        for answer, bucket in list(self.block.hint_database.items()):
+            reported = self.reported_keys(answer)
+            ratings = self.ratings(answer)
+            for entry in bucket:
+                yield answer, entry[0], ratings[entry[0]], hint_key(entry[0]) in reported
+
+    def limit_hints(self, answer, keep=()):
+        evicted = []
+        bucket = self.block.hint_database.get(answer, [])
+        while len(bucket) > self.hint_limit:
+            ratings = self.ratings(answer)
+            hints = [entry[0] for entry in bucket]
+            hint = choose_eviction([hint for hint in hints if hint not in keep] or hints, ratings.get,
+                                   self.eviction_policy)
+            evicted.append(hint)
+            self.remove_hint(answer, hint)
+        return evicted
+
+    def remove_hint(self, answer, hint):
+        entry = self.entry(answer, hint)
+        if entry is not None:
+            self.block.hint_database[answer].remove(entry)
+            self.count_votes(answer, -entry[1] - entry[2])
+        self.drop_report(answer, hint_key(hint))
+        if not self.block.hint_database.get(answer, True):
+            # don't keep empty buckets around
+            del self.block.hint_database[answer]
+            self.block.popular_answers.pop(answer, None)
+            self.block.hint_answers_version += 1
+
+    def vote(self, answer, hint, vote):
+        # another request saving hint_database at the same time loses
+        # the vote
+        entry = self.entry(answer, hint)
+        entry[1 if vote == "upvotes" else 2] += 1
+        self.count_votes(answer, 1)
+
+    def count_unhinted_answer(self, answer, count):
+        count_frequent(self.block.unhinted_answers, answer, self.unhinted_limit, count)
+
+    def unhinted_answers(self):
+        counts = self.block.unhinted_answers
+        return sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+    def reported_hints(self):
+        reported_hints = {}
+        for answer in self.block.reported_hints:
+            hints = [hint for hint, _key in self.reported_entries(answer)]
+            if hints:
+                reported_hints[answer] = hints
+        return reported_hints
+
+    def reported_entries(self, answer):
+        """
+        Return the hints reported for an answer that it still has, with
+        their keys, as (hint, key) pairs in the order they were reported.
+        """
+        keys = dict((hint_key(entry[0]), entry[0]) for entry in self.block.hint_database.get(answer, ()))
+        return [(keys[key], key) for key in self.block.reported_hints.get(answer, ()) if key in keys]
+
+    def is_reported(self, answer, hint):
+        return hint_key(hint) in self.reported_keys(answer) and self.has_hint(answer, hint)
+
+    def reported_answers(self, hint):
+        key = hint_key(hint)
+        return [answer for answer, keys in self.block.reported_hints.items()
+                if key in keys and self.has_hint(answer, hint)]
+
+    def report(self, answer, hint):
+        if not self.has_hint(answer, hint):
+            return False
+        reported = self.block.reported_hints.setdefault(answer, [])
+        key = hint_key(hint)
+        if key not in reported:
+            reported.append(key)
+            self.block.report_times.setdefault(answer, {})[key] = time.time()
+        return True
+
+    def unreport(self, answer, hint):
+        self.drop_report(answer, hint_key(hint))
+
+    def drop_report(self, answer, key):
+        """
+        Remove the report of a hint for an answer, given the hint's key,
+        if there is one.
+        """
+        reported = self.block.reported_hints.get(answer)
+        if reported and key in reported:
+            reported.remove(key)
+            if not reported:
+                del self.block.reported_hints[answer]
+            times = self.block.report_times.get(answer, {})
+            times.pop(key, None)
+            if not times:
+                self.block.report_times.pop(answer, None)
+
+    def reported_hints_page(self, answer=None, sort="time", cursor=None, limit=20):
+        after = decode_cursor(cursor) if cursor else None
+        if answer is None:
+            answers = list(self.block.reported_hints)
+        else:
+            answers = [answer] if answer in self.block.reported_hints else []
+        items = []
+        for reported_answer in answers:
+            times = self.block.report_times.get(reported_answer, {})
+            ratings = self.ratings(reported_answer)
+            for hint, key in self.reported_entries(reported_answer):
+                item = {"answer": reported_answer, "hint": hint,
+                        "upvotes": ratings[hint]["upvotes"], "downvotes": ratings[hint]["downvotes"],
+                        # hints reported before report times were kept
+                        # count as the oldest reports
+                        "reported_at": times.get(key, 0)}
+                if after is None or report_sort_key(item, sort) > after:
+                    items.append(item)
+        page = heapq.nsmallest(limit + 1, items, key=lambda item: report_sort_key(item, sort))
+        return page_with_cursor(page, sort, limit)
+
+    def field_sizes(self):
+        block = self.block
+        return {
+            "hint_database": len(json.dumps(block.hint_database)),
+            "reported_hints": len(json.dumps(block.reported_hints)),
+        }
+
+
+class SQLiteHintStore(HintStore):
+    """
+    Store hints in a local SQLite database shared by all hinter blocks.
+    Rows are keyed by the block's id, and hints are indexed by answer and
+    score so that the best hint is found without loading the others.
+    Each answer row keeps a count of its hints that are not reported and
+    of their votes, and each hint row its score under the block's ranking
+    policy, which is recorded in ranking_policies.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS answers (
+            block TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            available_hints INTEGER NOT NULL DEFAULT 0,
+            votes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (block, answer)
+        );
+        CREATE INDEX IF NOT EXISTS answers_votes ON answers (block, votes DESC, answer);
+        CREATE TABLE IF NOT EXISTS hints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            block TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            hint TEXT NOT NULL,
+            upvotes INTEGER NOT NULL DEFAULT 0,
+            downvotes INTEGER NOT NULL DEFAULT 0,
+            score REAL NOT NULL DEFAULT 0,
+            UNIQUE (block, answer, hint)
+        );
+        CREATE INDEX IF NOT EXISTS hints_ranking ON hints (block, answer, score DESC, id);
+        CREATE TABLE IF NOT EXISTS reports (
+            hint_id INTEGER PRIMARY KEY REFERENCES hints (id) ON DELETE CASCADE,
+            reported_at REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS unhinted_answers (
+            block TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (block, answer)
+        );
+        CREATE INDEX IF NOT EXISTS unhinted_answers_count ON unhinted_answers (block, count);
+        CREATE TABLE IF NOT EXISTS seeds (
+            block TEXT PRIMARY KEY,
+            version TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS answer_versions (
+            block TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS ranking_policies (
+            block TEXT PRIMARY KEY,
+            policy TEXT NOT NULL
+        );
+    """
+
+    _local = threading.local()
+
+    def __init__(self, path, block_id, hint_limit=10, eviction_policy="net_score", ranking_policy="net_score",
+                 unhinted_limit=UNHINTED_ANSWER_LIMIT):
+        self.path = path
+        self.block_id = six.text_type(block_id)
+        self.hint_limit = hint_limit
+        self.eviction_policy = eviction_policy
+        self.ranking_policy = ranking_policy
+        self.unhinted_limit = unhinted_limit
+        self._ranking_checked = False
+
+    @property
+    def connection(self):
+        """
+        Return this thread's connection to the database, creating the
+        tables the first time.
+        """
+        connections = self._local.__dict__.setdefault("connections", {})
+        if self.path not in connections:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA foreign_keys = ON")
+            connection.create_function("score_votes", 3, score_votes)
+            connection.executescript(self.SCHEMA)
+            connections[self.path] = connection
+        return connections[self.path]
+
+    @contextlib.contextmanager
+    def transaction(self):
+        depths = self._local.__dict__.setdefault("depths", {})
+        connection = self.connection
+        depths[self.path] = depths.get(self.path, 0) + 1
+        try:
+            yield
+        except BaseException:
+            if depths[self.path] == 1:
+                connection.rollback()
+            raise
+        else:
+            if depths[self.path] == 1:
+                connection.commit()
+        finally:
+            depths[self.path] -= 1
+
+    def execute(self, sql, parameters=()):
+        """
+        Run a statement on this thread's connection.
+        """
+        return self.connection.execute(sql, parameters)
+
+    def check_ranking_policy(self):
+        """
+        Rescore the block's hints if they were scored under another
+        ranking policy, e.g. after the instructor changed it. Blocks
+        without a recorded policy were scored by net rating.
+        """
+        if self._ranking_checked:
+            return
+        row = self.execute("SELECT policy FROM ranking_policies WHERE block = ?", (self.block_id,)).fetchone()
+        if (row[0] if row else "net_score") != self.ranking_policy:
+            self.rebuild_rankings()
+        self._ranking_checked = True
+
+    def rebuild_rankings(self):
+        with self.transaction():
+            self.execute("UPDATE hints SET score = score_votes(?, upvotes, downvotes) WHERE block = ?",
+                         (self.ranking_policy, self.block_id))
+            self.execute("INSERT OR REPLACE INTO ranking_policies (block, policy) VALUES (?, ?)",
+                         (self.block_id, self.ranking_policy))
+        self._ranking_checked = True
+
+    def seeded_version(self):
+        row = self.execute("SELECT version FROM seeds WHERE block = ?", (self.block_id,)).fetchone()
+        return row[0] if row else ""
+
+    def seed(self, initial_hints, version):
+        with self.transaction():
+            for answer, hints in initial_hints.items():
+                self._add_answer(answer)
+                for hint in hints:
+                    if not self.has_hint(answer, hint):
+                        self._add_hint(answer, hint)
+                        self._limit_hints(answer, keep=(hint,))
+            self.execute("INSERT OR REPLACE INTO seeds (block, version) VALUES (?, ?)", (self.block_id, version))
+
+    def _add_answer(self, answer):
+        if self.execute("INSERT OR IGNORE INTO answers (block, answer) VALUES (?, ?)",
+                        (self.block_id, answer)).rowcount:
+            self._count_answers_change()
+        self.execute("DELETE FROM unhinted_answers WHERE block = ? AND answer = ?", (self.block_id, answer))
+
+    def _count_answers_change(self):
+        self.execute("INSERT OR IGNORE INTO answer_versions (block, version) VALUES (?, 0)", (self.block_id,))
+        self.execute("UPDATE answer_versions SET version = version + 1 WHERE block = ?", (self.block_id,))
+
+    def answers(self):
+        rows = self.execute("SELECT answer FROM answers WHERE block = ?", (self.block_id,))
+        return [row[0] for row in rows]
+
+    def answers_version(self):
+        row = self.execute("SELECT version FROM answer_versions WHERE block = ?", (self.block_id,)).fetchone()
+        return row[0] if row else 0
+
+    def hint_id(self, answer, hint):
+        """
+        Return the row id of a hint, or None.
+        """
+        row = self.execute("SELECT id FROM hints WHERE block = ? AND answer = ? AND hint = ?",
+                           (self.block_id, answer, hint)).fetchone()
+        return row[0] if row else None
+
+    def has_hint(self, answer, hint):
+        return self.hint_id(answer, hint) is not None
+
+    def rating(self, answer, hint):
+        row = self.execute("SELECT upvotes, downvotes FROM hints WHERE block = ? AND answer = ? AND hint = ?",
+                           (self.block_id, answer, hint)).fetchone()
+        return {"upvotes": row[0], "downvotes": row[1]}
+
+    def ranked_hints(self, answer):
+        self.check_ranking_policy()
+        rows = self.execute("SELECT hint FROM hints WHERE block = ? AND answer = ? ORDER BY score DESC, id",
+                            (self.block_id, answer))
+        return [row[0] for row in rows]
+
+    def available_hints(self, answer):
+        rows = self.execute("SELECT h.hint FROM hints h WHERE h.block = ? AND h.answer = ? AND NOT EXISTS "
+                            "(SELECT 1 FROM reports r WHERE r.hint_id = h.id) ORDER BY h.id",
+                            (self.block_id, answer))
+        return [row[0] for row in rows]
+
+    def best_hint(self, answer, skip=()):
+        self.check_ranking_policy()
+        skip = list(skip)
+        row = self.execute(
+            "SELECT h.hint FROM hints h WHERE h.block = ? AND h.answer = ? AND NOT EXISTS "
+            "(SELECT 1 FROM reports r WHERE r.hint_id = h.id) "
+            "AND h.hint NOT IN ({}) "
+            "ORDER BY h.score DESC, h.id LIMIT 1".format(", ".join("?" * len(skip))),
+            [self.block_id, answer] + skip).fetchone()
+        self.hints_scanned = 1 if row else 0
+        return row[0] if row else None
+
+    def explore_hint(self, answer, skip=()):
+        skip = list(skip)
+        row = self.execute(
+            "SELECT h.hint FROM hints h WHERE h.block = ? AND h.answer = ? AND h.upvotes + h.downvotes < ? "
+            "AND NOT EXISTS (SELECT 1 FROM reports r WHERE r.hint_id = h.id) "
+            "AND h.hint NOT IN ({}) ORDER BY RANDOM() LIMIT 1".format(", ".join("?" * len(skip))),
+            [self.block_id, answer, EXPLORATION_VOTES] + skip).fetchone()
+        return row[0] if row else None
+
+    def popular_answers(self, limit):
+        rows = self.execute("SELECT answer FROM answers WHERE block = ? AND votes > 0 "
+                            "ORDER BY votes DESC, answer LIMIT ?", (self.block_id, limit))
+        return [row[0] for row in rows]
+
+    def available_hint_count(self, answer):
+        row = self.execute("SELECT available_hints FROM answers WHERE block = ? AND answer = ?",
+                           (self.block_id, answer)).fetchone()
+        return row[0] if row else 0
+
+    def available_hint_counts(self, answers):
+        answers = list(set(answers))
+        counts = dict((answer, 0) for answer in answers)
+        if answers:
+            counts.update(self.execute(
+                "SELECT answer, available_hints FROM answers WHERE block = ? AND answer IN ({})".format(
+                    ", ".join("?" * len(answers))),
+                [self.block_id] + answers).fetchall())
+        return counts
+
+    def _count_available(self, answer, change):
+        self.execute("UPDATE answers SET available_hints = available_hints + ? WHERE block = ? AND answer = ?",
+                     (change, self.block_id, answer))
+
+    def _count_votes(self, answer, change):
+        self.execute("UPDATE answers SET votes = votes + ? WHERE block = ? AND answer = ?",
+                     (change, self.block_id, answer))
+
+    def add_hint(self, answer, hint):
+        with self.transaction():
+            self._add_answer(answer)
+            self._add_hint(answer, hint)
+            return self._limit_hints(answer, keep=(hint,))
+
+    def _add_hint(self, answer, hint, upvotes=None, downvotes=None):
+        self.check_ranking_policy()
+        added = self.execute("INSERT OR IGNORE INTO hints (block, answer, hint, score) VALUES (?, ?, ?, ?)",
+                             (self.block_id, answer, hint, score_votes(self.ranking_policy, 0, 0))).rowcount
+        if added:
+            self._count_available(answer, 1)
+        if upvotes is not None:
+            hint_id, old_upvotes, old_downvotes = self.execute(
+                "SELECT id, upvotes, downvotes FROM hints WHERE block = ? AND answer = ? AND hint = ?",
+                (self.block_id, answer, hint)).fetchone()
+            upvotes, downvotes = max(old_upvotes, upvotes), max(old_downvotes, downvotes)
+            self.execute("UPDATE hints SET upvotes = ?, downvotes = ?, score = score_votes(?, ?, ?) WHERE id = ?",
+                         (upvotes, downvotes, self.ranking_policy, upvotes, downvotes, hint_id))
+            self._count_votes(answer, upvotes + downvotes - old_upvotes - old_downvotes)
+
+    def import_hint(self, answer, hint, upvotes, downvotes):
+        with self.transaction():
+            self._add_answer(answer)
+            self._add_hint(answer, hint, upvotes, downvotes)
+            return self._limit_hints(answer)
+
+    def iter_hints(self):
+        rows = self.execute("SELECT h.answer, h.hint, h.upvotes, h.downvotes, r.hint_id IS NOT NULL "
+                            "FROM hints h LEFT JOIN reports r ON r.hint_id = h.id "
+                            "WHERE h.block = ? ORDER BY h.answer, h.id", (self.block_id,))
+        for answer, hint, upvotes, downvotes, reported in rows:
+            yield answer, hint, {"upvotes": upvotes, "downvotes": downvotes}, bool(reported)
+
+    def limit_hints(self, answer, keep=()):
+        with self.transaction():
+            return self._limit_hints(answer, keep)
+
+    def _limit_hints(self, answer, keep=()):
+        rows = self.execute("SELECT hint, upvotes, downvotes FROM hints WHERE block = ? AND answer = ? ORDER BY id",
+                            (self.block_id, answer))
+        bucket = dict((row[0], {"upvotes": row[1], "downvotes": row[2]}) for row in rows)
+        evicted = []
+        while len(bucket) > self.hint_limit:
+            hint = choose_eviction([hint for hint in bucket if hint not in keep] or list(bucket), bucket.get,
+                                   self.eviction_policy)
+            self._remove_hint(answer, hint)
+            del bucket[hint]
+            evicted.append(hint)
+        return evicted
+
+    def remove_hint(self, answer, hint):
+        with self.transaction():
+            self._remove_hint(answer, hint)
+
+    def _remove_hint(self, answer, hint):
+        hint_id = self.hint_id(answer, hint)
+        if hint_id is None:
+            return
+        if not self._is_reported(hint_id):
+            self._count_available(answer, -1)
+        self._count_votes(answer, -self.execute("SELECT upvotes + downvotes FROM hints WHERE id = ?",
+                                                (hint_id,)).fetchone()[0])
+        self.execute("DELETE FROM hints WHERE id = ?", (hint_id,))
+        if self.execute("DELETE FROM answers WHERE block = ? AND answer = ? AND NOT EXISTS "
+                        "(SELECT 1 FROM hints WHERE block = ? AND answer = ?)",
+                        (self.block_id, answer, self.block_id, answer)).rowcount:
+            self._count_answers_change()
+
+    def vote(self, answer, hint, vote):
+        # SQLite applies the increments atomically, so concurrent votes
+        # are never lost
+        self.check_ranking_policy()
+        hint_id = self.hint_id(answer, hint)
+        if vote == "upvotes":
+            update = ("UPDATE hints SET upvotes = upvotes + 1, score = score_votes(?, upvotes + 1, downvotes) "
+                      "WHERE id = ?")
+        else:
+            update = ("UPDATE hints SET downvotes = downvotes + 1, score = score_votes(?, upvotes, downvotes + 1) "
+                      "WHERE id = ?")
+        with self.transaction():
+            self.execute(update, (self.ranking_policy, hint_id))
+            self._count_votes(answer, 1)
+
+    def count_unhinted_answer(self, answer, count):
+        with self.transaction():
+            updated = self.execute("UPDATE unhinted_answers SET count = count + ? WHERE block = ? AND answer = ?",
+                                   (count, self.block_id, answer)).rowcount
+            if updated:
+                return
+            tracked = self.execute("SELECT COUNT(*) FROM unhinted_answers WHERE block = ?",
+                                   (self.block_id,)).fetchone()[0]
+            if tracked >= self.unhinted_limit:
+                # replace the least frequent answer, see count_frequent
+                least, least_count = self.execute(
+                    "SELECT answer, count FROM unhinted_answers WHERE block = ? ORDER BY count LIMIT 1",
+                    (self.block_id,)).fetchone()
+                self.execute("DELETE FROM unhinted_answers WHERE block = ? AND answer = ?", (self.block_id, least))
+                count += least_count
+            self.execute("INSERT INTO unhinted_answers (block, answer, count) VALUES (?, ?, ?)",
+                         (self.block_id, answer, count))
+
+    def unhinted_answers(self):
+        rows = self.execute("SELECT answer, count FROM unhinted_answers WHERE block = ? ORDER BY count DESC",
+                            (self.block_id,))
+        return rows.fetchall()
+
+    def reported_hints(self):
+        rows = self.execute("SELECT h.answer, h.hint FROM reports r JOIN hints h ON h.id = r.hint_id "
+                            "WHERE h.block = ? ORDER BY h.answer, h.id", (self.block_id,))
+        reported_hints = {}
+        for answer, hint in rows:
+            reported_hints.setdefault(answer, []).append(hint)
+        return reported_hints
+
+    def _is_reported(self, hint_id):
+        return self.execute("SELECT 1 FROM reports WHERE hint_id = ?", (hint_id,)).fetchone() is not None
+
+    def is_reported(self, answer, hint):
+        hint_id = self.hint_id(answer, hint)
+        return hint_id is not None and self._is_reported(hint_id)
+
+    def reported_answers(self, hint):
+        rows = self.execute("SELECT h.answer FROM reports r JOIN hints h ON h.id = r.hint_id "
+                            "WHERE h.block = ? AND h.hint = ?", (self.block_id, hint))
+        return [row[0] for row in rows]
+
+    def report(self, answer, hint):
+        with self.transaction():
+            hint_id = self.hint_id(answer, hint)
+            if hint_id is None:
+                return False
+            if self.execute("INSERT OR IGNORE INTO reports (hint_id, reported_at) VALUES (?, ?)",
+                            (hint_id, time.time())).rowcount:
+                self._count_available(answer, -1)
+            return True
+
+    def unreport(self, answer, hint):
+        with self.transaction():
+            hint_id = self.hint_id(answer, hint)
+            if hint_id is not None and self.execute("DELETE FROM reports WHERE hint_id = ?", (hint_id,)).rowcount:
+                self._count_available(answer, 1)
+
+    def reported_hints_page(self, answer=None, sort="time", cursor=None, limit=20):
+        sign = -1 if sort.startswith("-") else 1
+        value = "r.reported_at" if sort.lstrip("-") == "time" else "(h.upvotes - h.downvotes)"
+        sort_value = "{} * {}".format(sign, value)
+        sql = ("SELECT h.answer, h.hint, h.upvotes, h.downvotes, r.reported_at "
+               "FROM reports r JOIN hints h ON h.id = r.hint_id WHERE h.block = ?")
+        parameters = [self.block_id]
+        if answer is not None:
+            sql += " AND h.answer = ?"
+            parameters.append(answer)
+        if cursor:
+            sql += " AND ({}, h.answer, h.hint) > (?, ?, ?)".format(sort_value)
+            parameters.extend(decode_cursor(cursor))
+        sql += " ORDER BY {}, h.answer, h.hint LIMIT ?".format(sort_value)
+        parameters.append(limit + 1)
+        page = [{"answer": row[0], "hint": row[1], "upvotes": row[2], "downvotes": row[3], "reported_at": row[4]}
+                for row in self.execute(sql, parameters)]
+        return page_with_cursor(page, sort, limit)
+
+
+def block_settings(block):
+    """
+    Return the "CrowdsourceHinter" bucket of the XBlock settings, or {}.
+    """
+    settings_service = block.runtime.service(block, "settings")
+    if settings_service:
+        return settings_service.get_settings_bucket(block, default={}) or {}
+    return {}
+
+
+def get_hint_store(block):
+    """
+    Return the HintStore configured for a CrowdsourceHinter block in the
+    "CrowdsourceHinter" bucket of the XBlock settings.
+    """
+    settings = block_settings(block)
+    backend = settings.get("STORAGE_BACKEND", "fields")
+    if backend == "sqlite":
+        return SQLiteHintStore(settings["SQLITE_PATH"], block.scope_ids.usage_id,
+                               block.hint_limit, block.hint_eviction_policy, block.hint_ranking_policy)
+    if backend != "fields":
+        raise ValueError("Unknown CrowdsourceHinter storage backend: {}".format(backend))
+    return FieldHintStore(block, block.hint_limit, block.hint_eviction_policy, block.hint_ranking_policy)
@@ -0,0 +1,211 @@
+"""
+Export and import of the hints of a CrowdsourceHinter as JSON Lines.
+
+An export is a stream of JSON objects, one per line, so that neither
+side has to hold a block's whole hint database in memory:
+
+    {"type": "header", "format": 1}
+    {"type": "hint", "answer": "michiganp", "hint": "...", "upvotes": 3, "downvotes": 1, "reported": false}
+    {"type": "initial_hints", "answer": "michiganp", "hints": ["..."]}
+    {"type": "generic_hint", "hint": "..."}
+
+Importing merges the records into the block: a hint it already has keeps
+the larger of its own and the record's count of each kind of vote,
+reports are kept, and initial and generic hints are added to the
+existing ones, so importing the same export twice changes nothing. Initial and generic hints are content settings, which
+the LMS can't save; they are only imported when asked for (content=1 in
+the query string of the import_hints handler, or --content), which works
+where content can be saved, e.g. in Studio or the workbench, and are
+counted as "skipped" otherwise.
+
+The same module is a command line tool that downloads an export from
+the export_hints handler of a block, or uploads one to its import_hints
+handler in chunks:
+
+    python -m crowdsourcehinter.transfer export HANDLER_URL -o hints.jsonl
+    python -m crowdsourcehinter.transfer import HANDLER_URL hints.jsonl
+
+where HANDLER_URL is the URL of the handler, e.g.
+https://lms.example.com/courses/<course id>/xblock/<usage id>/handler/export_hints,
+and --header passes the session cookie and CSRF token of a staff user.
+"""
+import argparse
+import itertools
+import json
+import sys
+
+import six
+import six.moves.urllib.request
+
+# The version of the export format, written in its header.
+EXPORT_FORMAT = 1
+
+# The number of records applied at once by import_lines, and sent per
+# request by the command line tool.
+IMPORT_CHUNK_SIZE = 500
+
+
+def export_records(block):
+    """
+    Iterate over the records of an export of a block's hints.
+    """
+    yield {"type": "header", "format": EXPORT_FORMAT}
+    for answer, hint, rating, reported in block.hint_store.iter_hints():
+        yield {"type": "hint", "answer": answer, "hint": hint,
+               "upvotes": rating["upvotes"], "downvotes": rating["downvotes"], "reported": reported}
+    for answer, hints in block.initial_hints.items():
+        yield {"type": "initial_hints", "answer": answer, "hints": hints}
+    for hint in block.generic_hints:
+        yield {"type": "generic_hint", "hint": hint}
+
+
+def export_lines(block):
+    """
+    Iterate over the lines of an export of a block's hints, as UTF-8
+    encoded bytes.
+    """
+    for record in export_records(block):
+        yield (json.dumps(record) + "\n").encode("utf8")
+
+
+def import_record(block, record, counts, content=False):
+    """
+    Merge one record of an export into a block, counting it in counts
+    ({"type": number of records}). Initial and generic hints are only
+    merged if content is true.
+    """
+    record_type = record["type"]
+    if record_type in ("initial_hints", "generic_hint") and not content:
+        record_type = "skipped"
+    elif record_type == "hint":
+        answer = record["answer"]
+        block.hint_store.import_hint(answer, record["hint"],
+                                     int(record.get("upvotes", 0)), int(record.get("downvotes", 0)))
+        if record.get("reported"):
+            block.hint_store.report(answer, record["hint"])
+    elif record_type in ("initial_hints", "generic_hint"):
+        import_content_record(block, record)
+    elif record_type == "header":
+        if record.get("format", EXPORT_FORMAT) > EXPORT_FORMAT:
+            raise ValueError("Unsupported export format: {}".format(record["format"]))
+    else:
+        raise ValueError("Unknown record type: {}".format(record_type))
+    counts[record_type] = counts.get(record_type, 0) + 1
+
+
+def import_content_record(block, record):
+    """
+    Add the hints of an initial_hints or generic_hint record to the
+    content fields of a block.
+    """
+    if record["type"] == "generic_hint":
+        if record["hint"] not in block.generic_hints:
+            block.generic_hints.append(record["hint"])
+        return
+    hints = record["hints"]
+    if isinstance(hints, six.string_types):
+        hints = [hints]
+    existing = block.initial_hints.get(record["answer"], [])
+    if isinstance(existing, six.string_types):
+        existing = [existing]
+    block.initial_hints[record["answer"]] = existing + [hint for hint in hints if hint not in existing]
+
+
+def import_lines(block, lines, chunk_size=IMPORT_CHUNK_SIZE, content=False):
+    """
+    Merge the lines of an export into a block, chunk_size records at a
+    time. Lines that can't be imported are skipped, and so are initial
+    and generic hints unless content is true.
+
+    Returns:
+      (counts, errors): the number of records imported of each type, and
+      a list of "line number: error" strings
+    """
+    counts = {}
+    errors = []
+    initial_hints_before = dict(block.initial_hints)
+    numbered = enumerate(lines, 1)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            break
+        with block.hint_store.transaction():
+            for number, line in chunk:
+                if isinstance(line, bytes):
+                    line = line.decode("utf8")
+                if not line.strip():
+                    continue
+                try:
+                    import_record(block, json.loads(line), counts, content)
+                except (ValueError, KeyError, TypeError) as error:
+                    errors.append(u"{}: {}".format(number, error))
+    if block.initial_hints != initial_hints_before:
+        block.initial_hints_version = block.fingerprint_initial_hints(block.initial_hints)
+    return counts, errors
+
+
+def request(url, headers, data=None):
+    """
+    Send a request to a handler of a block and return the response.
+    """
+    handler_request = six.moves.urllib.request.Request(url, data=data)
+    for header in headers:
+        name, _, value = header.partition(":")
+        handler_request.add_header(name.strip(), value.strip())
+    return six.moves.urllib.request.urlopen(handler_request)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import the hints of a crowdsource hinter block.")
+    parser.add_argument("--header", action="append", default=[],
+                        help='header sent with every request, e.g. "Cookie: sessionid=..."')
+    commands = parser.add_subparsers(dest="command")
+    export_command = commands.add_parser("export", help="download the hints of a block as JSON Lines")
+    export_command.add_argument("url", help="URL of the export_hints handler of the block")
+    export_command.add_argument("-o", "--output", help="file to write, instead of the standard output")
+    import_command = commands.add_parser("import", help="merge JSON Lines of hints into a block")
+    import_command.add_argument("url", help="URL of the import_hints handler of the block")
+    import_command.add_argument("input", help="file to read, or - for the standard input")
+    import_command.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                                help="number of lines sent per request")
+    import_command.add_argument("--content", action="store_true",
+                                help="also import initial and generic hints (in Studio or the workbench)")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        output = open(args.output, "wb") if args.output else getattr(sys.stdout, "buffer", sys.stdout)
+        try:
+            response = request(args.url, args.header)
+            for line in response:
+                output.write(line)
+        finally:
+            if args.output:
+                output.close()
+    elif args.command == "import":
+        lines = open(args.input, "rb") if args.input != "-" else getattr(sys.stdin, "buffer", sys.stdin)
+        headers = args.header + ["Content-Type: application/x-ndjson"]
+        url = args.url
+        if args.content:
+            url += ("&" if "?" in url else "?") + "content=1"
+        first_line = 1
+        while True:
+            chunk = list(itertools.islice(lines, args.chunk_size))
+            if not chunk:
+                break
+            result = json.loads(request(url, headers, b"".join(chunk)).read().decode("utf8"))
+            if not result.get("success"):
+                sys.exit(result.get("error", "Import failed"))
+            for error in result.get("errors", []):
+                # errors are numbered from the start of the chunk
+                number, _, message = error.partition(": ")
+                sys.stderr.write(u"line {}: {}\n".format(int(number) + first_line - 1, message))
+            first_line += len(chunk)
+            sys.stderr.write(json.dumps(result.get("imported", {}), sort_keys=True) + "\n")
+    else:
+        parser.print_help()
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
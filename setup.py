@@ -57,10 +57,17 @@ setup(
         'crowdsourcehinter',
     ],
     install_requires=load_requirements('requirements/base.in'),
+    extras_require={
+        # minifies the JavaScript and CSS when MINIFY_ASSETS is set
+        'minify': ['rcssmin', 'rjsmin'],
+    },
     entry_points={
         'xblock.v1': [
             'crowdsourcehinter = crowdsourcehinter:CrowdsourceHinter',
-        ]
+        ],
+        'console_scripts': [
+            'crowdsourcehinter-transfer = crowdsourcehinter.transfer:main',
+        ],
     },
     package_data=package_data("crowdsourcehinter", ["static", "public"]),
     keywords='crowdsourcehinter xblock',
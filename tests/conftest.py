@@ -0,0 +1,30 @@
+"""
+Fixtures shared by the tests.
+"""
+import pytest
+
+from benchmarks.runtime import JsonKeyValueStore
+from crowdsourcehinter import answers, crowdsourcehinter
+
+from .helpers import BACKENDS, backend_settings, load_block
+
+
+@pytest.fixture(params=BACKENDS)
+def load(request, tmp_path):
+    """
+    Return a function loading the same block every time, with the backend
+    of the test's parameter. Fields are only kept if the block is saved.
+    """
+    kvs = JsonKeyValueStore()
+    settings = backend_settings(request.param, tmp_path)
+    return lambda user_id="student", staff=False, **fields: load_block(kvs, settings, user_id, staff, **fields)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """
+    Forget the initial hints fingerprints and near match indexes cached
+    by the blocks of other tests, which share their usage id.
+    """
+    crowdsourcehinter._initial_hints_fingerprints.clear()
+    answers._near_match_indexes.clear()
@@ -0,0 +1,39 @@
+"""
+Helpers for loading CrowdsourceHinter blocks in tests.
+"""
+import json
+from xml.etree import ElementTree
+
+from benchmarks.runtime import BenchmarkRuntime, JsonKeyValueStore, make_block
+from crowdsourcehinter import CrowdsourceHinter
+
+BACKENDS = ("fields", "sqlite")
+
+
+def backend_settings(backend, tmp_path):
+    """
+    Return the XBlock settings selecting a storage backend.
+    """
+    if backend == "sqlite":
+        return {"STORAGE_BACKEND": "sqlite", "SQLITE_PATH": str(tmp_path / "hints.db")}
+    return {}
+
+
+def load_block(kvs, settings, user_id="student", staff=False, **fields):
+    """
+    Load a block from a key-value store, setting content fields first.
+    """
+    block = make_block(kvs, user_id, settings, staff)
+    for name, value in fields.items():
+        setattr(block, name, value)
+    return block
+
+
+def parse_block(**settings):
+    """
+    Parse a block whose XML holds the given optional settings.
+    """
+    node = ElementTree.Element("crowdsourcehinter")
+    node.text = json.dumps(dict({"generic_hints": "", "initial_hints": {}, "target_problem": ""}, **settings))
+    kvs = JsonKeyValueStore()
+    return CrowdsourceHinter.parse_xml(node, BenchmarkRuntime(kvs), make_block(kvs).scope_ids, None)
@@ -0,0 +1,102 @@
+"""
+Tests of the canonicalization and near matching of student answers.
+"""
+import random
+
+import pytest
+
+from benchmarks.runtime import call_handler
+from crowdsourcehinter.answers import (TrigramIndex, canonicalize, edit_distance, namespace_answer,
+                                       split_namespace)
+from crowdsourcehinter.crowdsourcehinter import NO_HINTS_MESSAGE
+
+from .helpers import parse_block
+from .test_crowdsourcehinter import add_hints
+
+
+@pytest.mark.parametrize("steps, answer, canonical", [
+    ([], u" Michigan ", u" Michigan "),
+    (["lowercase"], u"MichiGan", u"michigan"),
+    (["whitespace"], u"  new \t york ", u"new york"),
+    (["punctuation"], u"it's 4.", u"its 4"),
+    (["unicode", "lowercase"], u"Ｍｉ", u"mi"),
+    (["numeric"], u"0.50", u"0.5"),
+    (["numeric"], u"1e3", u"1000"),
+    (["numeric"], u"nan", u"nan"),
+    (["numeric"], u"four", u"four"),
+    # steps run in order: punctuation first turns "1,5" into "15"
+    (["punctuation", "numeric"], u"1,5", u"15"),
+])
+def test_canonicalize(steps, answer, canonical):
+    assert canonicalize(answer, steps) == canonical
+
+
+def test_canonicalize_rounds_numbers_to_the_tolerance():
+    assert canonicalize(u"3.14159", ["numeric"], 0.01) == u"3.14"
+    assert canonicalize(u"3.139", ["numeric"], 0.01) == canonicalize(u"3.141", ["numeric"], 0.01)
+
+
+def test_canonicalize_rejects_unknown_steps():
+    with pytest.raises(ValueError):
+        canonicalize(u"a", ["stem"])
+
+
+@pytest.mark.parametrize("position, answer, key", [
+    (0, u"42", u"42"),
+    (1, u"42", u"[input 2] 42"),
+    (0, u"[input 2] 42", u"[input 1] [input 2] 42"),
+])
+def test_namespaces_round_trip(position, answer, key):
+    assert namespace_answer(position, answer) == key
+    assert split_namespace(key) == (position, answer)
+
+
+def test_trigram_index_finds_answers_within_the_distance():
+    index = TrigramIndex([u"michigan", u"michigann", u"ohio", u"mississippi"])
+    assert index.search(u"michigan", 1) == [(0, u"michigan"), (1, u"michigann")]
+    assert index.search(u"ohoi", 2) == [(2, u"ohio")]
+    assert index.search(u"texas", 1) == []
+
+
+def test_trigram_index_sync_adds_and_removes_answers():
+    index = TrigramIndex([u"michigan", u"ohio"])
+    index.sync([u"ohio", u"iowa"])
+    assert index.size == 2
+    assert index.search(u"michigan", 1) == []
+    assert index.search(u"iowa", 0) == [(0, u"iowa")]
+    # nothing of the removed answer is left behind
+    assert index.postings == TrigramIndex([u"ohio", u"iowa"]).postings
+    assert index.lengths == TrigramIndex([u"ohio", u"iowa"]).lengths
+
+
+def test_trigram_index_matches_a_scan_of_every_answer():
+    rng = random.Random(7)
+    words = set(u"".join(rng.choice(u"abc") for _ in range(rng.randint(1, 7))) for _ in range(300))
+    index = TrigramIndex(words)
+    for _ in range(100):
+        query = u"".join(rng.choice(u"abc") for _ in range(rng.randint(1, 7)))
+        for max_distance in (1, 2):
+            expected = sorted((edit_distance(query, word, max_distance), word) for word in words)
+            expected = [result for result in expected if result[0] <= max_distance]
+            assert index.search(query, max_distance) == expected
+
+
+def test_get_hint_near_matches_answers_to_the_same_input(load):
+    add_hints(load, {u"michigan": [u"h1"], u"[input 3] ohio": [u"h3"]})
+    submission = u"input_1=michigann&input_2=ohio&input_3=ohi"
+    hints = call_handler(load(near_match_distance=1), "get_hint", {"submittedanswer": submission})["Hints"]
+    assert [(hint["AnswerKey"], hint["BestHint"]) for hint in hints] == [
+        (u"michigan", u"h1"),
+        # one edit away from "[input 3] ohio", but an answer to another input
+        (u"[input 2] ohio", NO_HINTS_MESSAGE),
+        (u"[input 3] ohio", u"h3"),
+    ]
+    hints = call_handler(load(near_match_distance=0), "get_hint", {"submittedanswer": submission})["Hints"]
+    assert [hint["BestHint"] for hint in hints] == [NO_HINTS_MESSAGE] * 3
+
+
+def test_parse_xml_reads_the_canonicalization_steps():
+    assert parse_block(answer_canonicalization=["unicode", "numeric"]).answer_canonicalization == ["unicode", "numeric"]
+    for steps in (["lowercase", "stem"], "lowercase"):
+        with pytest.raises(ValueError):
+            parse_block(answer_canonicalization=steps)
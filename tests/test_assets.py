@@ -0,0 +1,68 @@
+"""
+Tests of the static assets of the views.
+"""
+import pytest
+
+from benchmarks.runtime import JsonKeyValueStore
+from crowdsourcehinter import assets
+
+from .helpers import load_block
+
+
+class FakeMinifier(object):
+    """
+    Stands in for rjsmin and rcssmin, marking what it minified.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def minify(self, text):
+        self.calls += 1
+        return "minified"
+
+    jsmin = cssmin = minify
+
+
+@pytest.fixture(autouse=True)
+def view_assets_cache(monkeypatch):
+    """
+    Start every test with no assets loaded.
+    """
+    monkeypatch.setattr(assets, "_view_assets", {})
+
+
+def test_view_assets_are_loaded_once_per_process(monkeypatch):
+    loaded = []
+    load_view_assets = assets.load_view_assets
+    monkeypatch.setattr(assets, "load_view_assets", lambda *args: loaded.append(args) or load_view_assets(*args))
+    student = assets.view_assets("student")
+    assert assets.view_assets("student") is student
+    assets.view_assets("studio")
+    assert loaded == [("student", False), ("studio", False)]
+    assert "CrowdsourceHinter" in student.javascript
+    assert student.html == assets.resource_string(assets.VIEW_FILES["student"].html)
+
+
+def test_view_assets_are_minified_when_asked(monkeypatch):
+    minifier = FakeMinifier()
+    monkeypatch.setattr(assets, "rjsmin", minifier)
+    monkeypatch.setattr(assets, "rcssmin", minifier)
+    minified = assets.view_assets("student", minify=True)
+    assert (minified.css, minified.javascript) == ("minified", "minified")
+    assert assets.view_assets("student").javascript != "minified"
+    assert minifier.calls == 2
+
+
+def test_view_assets_are_not_minified_without_the_minifiers(monkeypatch):
+    monkeypatch.setattr(assets, "rjsmin", None)
+    monkeypatch.setattr(assets, "rcssmin", None)
+    assert assets.view_assets("student", minify=True) == assets.view_assets("student")
+
+
+def test_views_link_the_vendored_mustache():
+    block = load_block(JsonKeyValueStore(), {"MINIFY_ASSETS": True})
+    for fragment in (block.student_view(), block.studio_view()):
+        urls = [resource.data for resource in fragment.resources if resource.kind == "url"]
+        assert urls == ["/local_resource/public/3rdParty/mustache.js"]
+    assert "mustache.js - Logic-less" in assets.resource_string(assets.MUSTACHE_JS)
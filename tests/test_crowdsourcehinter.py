@@ -0,0 +1,159 @@
+"""
+Tests of the handlers of CrowdsourceHinter.
+"""
+from benchmarks.runtime import call_handler
+from crowdsourcehinter import CrowdsourceHinter
+from crowdsourcehinter.crowdsourcehinter import VOTED_HINTS_SIZE
+
+
+def add_hints(load, hints):
+    """
+    Add hints ({"answer": ["hint", ...]}) to the block and save it.
+    """
+    block = load()
+    for answer, answer_hints in hints.items():
+        for hint in answer_hints:
+            block.hint_store.add_hint(answer, hint)
+    block.save()
+
+
+def rate(load, answer, hint, rating, staff=False):
+    """
+    Rate a hint through rate_hint, as a student or as staff.
+    """
+    return call_handler(load(staff=staff), "rate_hint",
+                        {"student_answer": answer, "hint": hint, "student_rating": rating})
+
+
+def test_students_cannot_moderate_hints(load):
+    add_hints(load, {"a": ["h1"], "b": ["h1"]})
+    assert rate(load, "a", "h1", "report") == {"rating": "reported", "hint": "h1"}
+    for rating in ("remove", "unreport"):
+        for answer in ("a", "Reported"):
+            assert rate(load, answer, "h1", rating)["success"] is False
+    store = load().hint_store
+    assert store.is_reported("a", "h1")
+    assert store.has_hint("b", "h1")
+
+
+def test_staff_removes_a_hint_from_the_answer_it_was_reported_for(load):
+    add_hints(load, {"a": ["h1"], "b": ["h1"], "c": ["h1"]})
+    rate(load, "a", "h1", "report")
+    rate(load, "c", "h1", "report")
+    assert rate(load, "b", "h1", "remove", staff=True) == {"success": False, "error": "Hint not reported"}
+    assert rate(load, "a", "h1", "remove", staff=True) == {"rating": "removed"}
+    store = load().hint_store
+    assert not store.has_hint("a", "h1")
+    assert store.has_hint("b", "h1")
+    assert store.is_reported("c", "h1")
+
+
+def test_staff_moderates_every_report_of_legacy_requests(load):
+    add_hints(load, {"a": ["h1", "h2"], "b": ["h1"], "c": ["h1"]})
+    rate(load, "a", "h1", "report")
+    rate(load, "b", "h1", "report")
+    rate(load, "a", "h2", "report")
+    assert rate(load, "Reported", "h1", "unreport", staff=True) == {"rating": "unreported"}
+    store = load().hint_store
+    assert store.reported_hints() == {"a": ["h2"]}
+    assert rate(load, "Reported", "h2", "remove", staff=True) == {"rating": "removed"}
+    store = load().hint_store
+    assert not store.has_hint("a", "h2")
+    assert store.has_hint("c", "h1")
+
+
+def test_get_hint_counts_the_hints_of_all_inputs_at_once(load, monkeypatch):
+    add_hints(load, {"a": ["hint for a"], "[input 2] b": ["hint for b"]})
+    block = load()
+    store = block.hint_store
+    store.unhinted_sample_rate = 1.0
+
+    def available_hint_count(answer):
+        raise AssertionError("available_hint_count({!r}) called".format(answer))
+    monkeypatch.setattr(store, "available_hint_counts", lambda answers: {"a": 1, "[input 2] b": 1, "[input 3] c": 0})
+    monkeypatch.setattr(store, "available_hint_count", available_hint_count)
+    response = call_handler(block, "get_hint", {"submittedanswer": "input_1=a&input_2=b&input_3=c"})
+    assert [hint["BestHint"] for hint in response["Hints"]] == [
+        "hint for a", "hint for b", "Sorry, there are no hints for this answer."]
+    assert [answer for answer, _count in load().hint_store.unhinted_answers()] == ["[input 3] c"]
+
+
+def test_get_hint_only_filters_inputs_by_a_list(load):
+    add_hints(load, {"a": ["hint for a"], "[input 2] b": ["hint for b"]})
+    data = {"submittedanswer": "input_1=a&input_2=b"}
+    response = call_handler(load(), "get_hint", dict(data, incorrect_inputs=["input_2"]))
+    assert [hint["InputId"] for hint in response["Hints"]] == ["input_2"]
+    # a string would match every input ID it contains
+    response = call_handler(load(), "get_hint", dict(data, incorrect_inputs="input_1x"))
+    assert [hint["InputId"] for hint in response["Hints"]] == ["input_1", "input_2"]
+
+
+def test_get_hint_returns_the_answer_as_submitted_and_its_key(load):
+    add_hints(load, {"a": ["hint for a"], "[input 2] b": ["hint for b"]})
+    response = call_handler(load(), "get_hint", {"submittedanswer": "input_1=A&input_2=B"})
+    assert [(hint["StudentAnswer"], hint["AnswerKey"]) for hint in response["Hints"]] == [
+        ("A", "a"), ("B", "[input 2] b")]
+    assert (response["StudentAnswer"], response["AnswerKey"]) == ("A", "a")
+
+
+def test_a_first_answer_that_looks_like_a_namespace_keeps_its_own_hints(load):
+    add_hints(load, {"[input 2] b": ["hint for b"]})
+    response = call_handler(load(), "get_hint", {"submittedanswer": "input_1=%5Binput%202%5D%20b"})
+    assert response["AnswerKey"] == "[input 1] [input 2] b"
+    assert response["BestHint"] == "Sorry, there are no hints for this answer."
+
+
+def test_resubmitted_hints_get_one_upvote_per_student(load):
+    add_hints(load, {"a": ["Check the spelling."]})
+    submission = {"answer": "a", "new_hint_submission": "check the spelling"}
+    response = call_handler(load(), "add_new_hint", submission)
+    assert (response["hint"], response["upvoted"]) == ("Check the spelling.", True)
+    assert call_handler(load(), "add_new_hint", submission)["upvoted"] is False
+    call_handler(load(user_id="other"), "add_new_hint", submission)
+    # a student who rated the hint doesn't upvote it again either
+    call_handler(load(user_id="critic"), "rate_hint",
+                 {"student_answer": "a", "hint": "Check the spelling.", "student_rating": "downvote"})
+    call_handler(load(user_id="rater"), "rate_hint",
+                 {"student_answer": "a", "hint": "Check the spelling.", "student_rating": "upvote"})
+    assert call_handler(load(user_id="rater"), "add_new_hint", submission)["upvoted"] is False
+    assert load().hint_store.rating("a", "Check the spelling.") == {"upvotes": 3, "downvotes": 1}
+
+
+def test_add_new_hint_reports_a_hint_that_could_not_be_kept(load):
+    submission = {"answer": "a", "new_hint_submission": "Check the spelling."}
+    assert call_handler(load(hint_limit=1), "add_new_hint", submission)["result"] == "Hint added"
+    submission["new_hint_submission"] = "Count the letters."
+    assert call_handler(load(hint_limit=1), "add_new_hint", submission)["result"] == "Hint added"
+    assert load(hint_limit=1).hint_store.ranked_hints("a") == ["Count the letters."]
+    response = call_handler(load(hint_limit=0), "add_new_hint", dict(submission, new_hint_submission="Look again."))
+    assert response["success"] is False
+
+
+def test_initial_hints_are_seeded_again_under_new_canonicalization(load):
+    initial_hints = {"A  b": ["Mind the space."]}
+    block = load(initial_hints=initial_hints)
+    assert call_handler(block, "get_hint", {"submittedanswer": "input_1=a%20%20b"})["BestHint"] == "Mind the space."
+    block.save()
+    settings = {"initial_hints": initial_hints, "answer_canonicalization": ["lowercase", "whitespace"]}
+    response = call_handler(load(**settings), "get_hint", {"submittedanswer": "input_1=a%20b"})
+    assert response["BestHint"] == "Mind the space."
+
+
+def test_the_initial_hints_of_a_block_without_a_version_are_fingerprinted_once(load, monkeypatch):
+    fingerprints = []
+    fingerprint = CrowdsourceHinter.fingerprint_initial_hints
+    monkeypatch.setattr(CrowdsourceHinter, "fingerprint_initial_hints",
+                        staticmethod(lambda hints: fingerprints.append(hints) or fingerprint(hints)))
+    for _request in range(3):
+        block = load(initial_hints={"a": "Check the spelling."})
+        assert call_handler(block, "get_hint", {"submittedanswer": "input_1=a"})["BestHint"] == "Check the spelling."
+        block.save()
+    assert len(fingerprints) == 1
+
+
+def test_voted_hints_keeps_the_latest_votes(load):
+    answers = ["a{}".format(i) for i in range(VOTED_HINTS_SIZE + 2)]
+    add_hints(load, {answer: ["h"] for answer in answers})
+    for answer in answers:
+        rate(load, answer, "h", "upvote")
+    assert load().voted_hints == [[answer, "h"] for answer in answers[-VOTED_HINTS_SIZE:]]
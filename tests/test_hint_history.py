@@ -0,0 +1,62 @@
+"""
+Tests of the hints a student has been shown, kept in hint_history.
+"""
+from benchmarks.runtime import call_handler
+from crowdsourcehinter.crowdsourcehinter import HINT_HISTORY_SIZE
+
+from .test_crowdsourcehinter import add_hints
+
+
+def get_hint(load, answer):
+    """
+    Return the hint get_hint shows for an answer to a problem with one input.
+    """
+    return call_handler(load(), "get_hint", {"submittedanswer": "input_1=" + answer})["BestHint"]
+
+
+def test_get_hint_shows_hints_the_student_has_not_seen_first(load):
+    add_hints(load, {"a": ["h1", "h2", "h3"]})
+    store = load().hint_store
+    store.vote("a", "h1", "upvotes")
+    store.vote("a", "h1", "upvotes")
+    store.vote("a", "h2", "upvotes")
+    load().save()
+    assert [get_hint(load, "a") for _ in range(4)] == ["h1", "h2", "h3", "h1"]
+
+
+def test_hint_history_keeps_the_first_pair_and_the_latest_ones(load):
+    answers = ["a{}".format(i) for i in range(HINT_HISTORY_SIZE + 3)]
+    add_hints(load, {answer: ["hint for " + answer] for answer in answers})
+    for answer in answers:
+        get_hint(load, answer)
+    history = load().hint_history
+    assert len(history) == HINT_HISTORY_SIZE + 1
+    assert history[0] == ["a0", "hint for a0"]
+    assert history[1:] == [[answer, "hint for " + answer] for answer in answers[-HINT_HISTORY_SIZE:]]
+
+
+def test_a_repeated_pair_moves_to_the_end_of_the_history(load):
+    add_hints(load, {"a": ["ha"], "b": ["hb"], "c": ["hc"]})
+    for answer in ("a", "b", "c", "b"):
+        get_hint(load, answer)
+    assert load().hint_history == [["a", "ha"], ["c", "hc"], ["b", "hb"]]
+
+
+def test_legacy_lists_are_moved_to_the_history(load):
+    add_hints(load, {"a": ["ha"], "b": ["hb"]})
+    block = load()
+    block.incorrect_answers = ["a", "b"]
+    block.used = ["ha"]
+    block.save()
+    assert get_hint(load, "b") == "hb"
+    block = load()
+    assert block.hint_history == [["a", "ha"], ["b", None], ["b", "hb"]]
+    assert block.incorrect_answers == []
+
+
+def test_the_first_pair_is_rated_and_the_history_forgotten(load):
+    add_hints(load, {"a": ["ha"], "b": ["hb"]})
+    get_hint(load, "a")
+    get_hint(load, "b")
+    assert call_handler(load(), "get_used_hint_answer_data", {}) == {"ha": "a"}
+    assert load().hint_history == []
@@ -0,0 +1,71 @@
+"""
+Tests of the metrics the handlers report.
+"""
+import pytest
+
+from benchmarks.runtime import JsonKeyValueStore, call_handler
+from crowdsourcehinter.metrics import MemorySink, NullSink, StatsdSink, get_metrics_sink
+
+from .helpers import load_block
+
+MEMORY_SETTINGS = {"METRICS_BACKEND": "memory"}
+
+
+@pytest.fixture
+def sink():
+    """
+    Return the memory sink of the process, emptied.
+    """
+    memory_sink = get_metrics_sink(MEMORY_SETTINGS)
+    memory_sink.clear()
+    return memory_sink
+
+
+def test_memory_sink_keeps_metrics_in_order():
+    memory_sink = MemorySink()
+    memory_sink.send("count", "a", 1, {})
+    memory_sink.send("gauge", "b", 2, {})
+    memory_sink.send("count", "a", 3, {"block": "hinter"})
+    assert memory_sink.values("a") == [1, 3]
+    assert memory_sink.records[1] == ("gauge", "b", 2, {})
+    memory_sink.clear()
+    assert memory_sink.values("a") == []
+
+
+def test_statsd_sink_formats_datagrams_with_tags():
+    statsd_sink = StatsdSink()
+    try:
+        assert statsd_sink.format("timing", "a.b", 1.5, {}) == "a.b:1.5|ms"
+        assert statsd_sink.format("count", "a", 2, {"z": 1, "block": "hinter"}) == "a:2|c|#block:hinter,z:1"
+        assert statsd_sink.format("gauge", "a", 3, {}) == "a:3|g"
+    finally:
+        statsd_sink.socket.close()
+
+
+def test_get_metrics_sink_shares_sinks_and_rejects_unknown_backends():
+    assert isinstance(get_metrics_sink({}), NullSink)
+    assert get_metrics_sink(MEMORY_SETTINGS) is get_metrics_sink(MEMORY_SETTINGS)
+    with pytest.raises(ValueError):
+        get_metrics_sink({"METRICS_BACKEND": "graphite"})
+
+
+def test_handlers_report_latency_and_field_sizes(sink):
+    kvs = JsonKeyValueStore()
+    call_handler(load_block(kvs, MEMORY_SETTINGS), "get_hint", {"submittedanswer": "input_1=a"})
+    assert len(sink.values("crowdsourcehinter.handler.get_hint")) == 1
+    # only handlers that change the hints report the size of their fields
+    assert sink.values("crowdsourcehinter.field_size.hint_database") == []
+    call_handler(load_block(kvs, MEMORY_SETTINGS), "add_new_hint", {"answer": "a", "new_hint_submission": "h1"})
+    assert len(sink.values("crowdsourcehinter.handler.add_new_hint")) == 1
+    block = load_block(kvs, MEMORY_SETTINGS)
+    assert sink.values("crowdsourcehinter.field_size.hint_database") == [block.hint_store.field_sizes()["hint_database"]]
+    assert all(record[3] == {"block": "hinter"} for record in sink.records)
+
+
+def test_add_new_hint_counts_evictions(sink):
+    kvs = JsonKeyValueStore()
+    for hint in ("h1", "h2"):
+        call_handler(load_block(kvs, MEMORY_SETTINGS, hint_limit=1), "add_new_hint",
+                     {"answer": "a", "new_hint_submission": hint})
+    assert sink.values("crowdsourcehinter.evictions") == [0, 1]
+    assert load_block(kvs, MEMORY_SETTINGS).hint_store.ranked_hints("a") == ["h2"]
@@ -0,0 +1,87 @@
+"""
+Tests of the ranking policies and the exploration of hints with few votes.
+"""
+import pytest
+
+from benchmarks.runtime import call_handler
+from crowdsourcehinter.ranking import EXPLORATION_VOTES, bayesian_average, wilson_lower_bound
+
+from .helpers import parse_block
+from .test_crowdsourcehinter import add_hints
+
+
+def vote(load, answer, hint, upvotes, downvotes):
+    """
+    Cast votes for a hint and save the block.
+    """
+    block = load()
+    for _vote in range(upvotes):
+        block.hint_store.vote(answer, hint, "upvotes")
+    for _vote in range(downvotes):
+        block.hint_store.vote(answer, hint, "downvotes")
+    block.save()
+
+
+def get_hint(load, **fields):
+    """
+    Return the hint get_hint shows for the answer "a", with the given fields.
+    """
+    return call_handler(load(**fields), "get_hint", {"submittedanswer": "input_1=a"})["BestHint"]
+
+
+def test_scores():
+    assert wilson_lower_bound(0, 0) == 0.0
+    assert 0 < wilson_lower_bound(5, 0) < 1
+    assert wilson_lower_bound(50, 0) > wilson_lower_bound(5, 0)
+    assert bayesian_average(0, 0) == 0.5
+    assert bayesian_average(6, 0) == 0.8
+
+
+@pytest.mark.parametrize("policy, best", [
+    ("net_score", "many votes"),
+    ("wilson", "few upvotes"),
+    ("bayesian", "few upvotes"),
+])
+def test_ranking_policies(load, policy, best):
+    add_hints(load, {"a": ["many votes", "few upvotes"]})
+    vote(load, "a", "many votes", 30, 20)
+    vote(load, "a", "few upvotes", 5, 0)
+    assert load(hint_ranking_policy=policy).hint_store.ranked_hints("a")[0] == best
+    assert get_hint(load, hint_ranking_policy=policy) == best
+
+
+def test_a_policy_change_takes_effect_immediately(load):
+    add_hints(load, {"a": ["many votes", "few upvotes"]})
+    vote(load, "a", "many votes", 30, 20)
+    vote(load, "a", "few upvotes", 5, 0)
+    assert load().hint_store.ranked_hints("a") == ["many votes", "few upvotes"]
+    assert load(hint_ranking_policy="wilson").hint_store.ranked_hints("a") == ["few upvotes", "many votes"]
+    assert load().hint_store.ranked_hints("a") == ["many votes", "few upvotes"]
+
+
+def test_exploration_shows_hints_that_need_votes(load):
+    add_hints(load, {"a": ["rated", "new", "reported"]})
+    vote(load, "a", "rated", EXPLORATION_VOTES, 0)
+    block = load()
+    block.hint_store.report("a", "reported")
+    block.save()
+    assert get_hint(load) == "rated"
+    # a student who hasn't seen "rated" is shown the hint with few votes
+    assert get_hint(load, user_id="explorer", hint_exploration_rate=1.0) == "new"
+
+
+def test_explore_hint_skips_rated_reported_and_seen_hints(load):
+    add_hints(load, {"a": ["rated", "new", "reported"]})
+    vote(load, "a", "rated", EXPLORATION_VOTES, 0)
+    store = load().hint_store
+    store.report("a", "reported")
+    assert store.explore_hint("a") == "new"
+    assert store.explore_hint("a", skip=["new"]) is None
+    assert store.explore_hint("b") is None
+
+
+def test_parse_xml_reads_the_ranking_policy():
+    assert parse_block(hint_ranking_policy="wilson").hint_ranking_policy == "wilson"
+    assert parse_block().hint_ranking_policy == "net_score"
+    with pytest.raises(ValueError):
+        parse_block(hint_ranking_policy="votes")
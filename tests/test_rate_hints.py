@@ -0,0 +1,79 @@
+"""
+Tests of rate_hints, which applies several ratings in one request.
+"""
+from benchmarks.runtime import call_handler
+from crowdsourcehinter.crowdsourcehinter import MAX_BATCH_RATINGS
+
+from .test_crowdsourcehinter import add_hints
+
+
+def rating(answer, hint, student_rating):
+    """
+    Return a rating as sent to rate_hint.
+    """
+    return {"student_answer": answer, "hint": hint, "student_rating": student_rating}
+
+
+def test_rate_hints_returns_a_result_per_rating(load):
+    add_hints(load, {"a": ["h1", "h2"]})
+    ratings = [
+        rating("a", "h1", "upvote"),
+        rating("a", "h2", "downvote"),
+        rating("a", "missing", "upvote"),
+        rating("a", "h2", "report"),
+        rating("a", "h1", "shrug"),
+        {"hint": "h1"},
+    ]
+    response = call_handler(load(), "rate_hints", {"ratings": ratings})
+    assert response == {"success": True, "results": [
+        {"success": True},
+        {"success": True},
+        {"success": False, "error": "Hint not found"},
+        {"rating": "reported", "hint": "h2"},
+        {"success": False, "error": "Unrecognized operation"},
+        {"success": False, "error": "Malformed rating"},
+    ]}
+    store = load().hint_store
+    assert store.rating("a", "h1") == {"upvotes": 1, "downvotes": 0}
+    assert store.rating("a", "h2") == {"upvotes": 0, "downvotes": 1}
+    assert store.is_reported("a", "h2")
+
+
+def test_rate_hints_applies_ratings_in_order(load):
+    add_hints(load, {"a": ["h1"], "b": ["h1"]})
+    ratings = [rating("a", "h1", "report"), rating("a", "h1", "remove"), rating("a", "h1", "upvote")]
+    results = call_handler(load(staff=True), "rate_hints", {"ratings": ratings})["results"]
+    assert results == [{"rating": "reported", "hint": "h1"}, {"rating": "removed"},
+                       {"success": False, "error": "Hint not found"}]
+    assert load().hint_store.answers() == ["b"]
+
+
+def test_students_cannot_moderate_in_a_batch(load):
+    add_hints(load, {"a": ["h1"]})
+    results = call_handler(load(), "rate_hints", {"ratings": [rating("a", "h1", "report"),
+                                                              rating("a", "h1", "remove")]})["results"]
+    assert results[1] == {"success": False, "error": "Only staff can moderate reported hints."}
+    assert load().hint_store.has_hint("a", "h1")
+
+
+def test_rate_hints_rejects_invalid_batches(load):
+    assert call_handler(load(), "rate_hints", {"ratings": "a"})["success"] is False
+    ratings = [rating("a", "h1", "upvote")] * (MAX_BATCH_RATINGS + 1)
+    assert call_handler(load(), "rate_hints", {"ratings": ratings})["success"] is False
+
+
+def test_a_student_votes_on_a_hint_once(load):
+    add_hints(load, {"a": ["h1"]})
+    ratings = [rating("a", "h1", "upvote")] * 3 + [rating("a", "h1", "downvote")]
+    results = call_handler(load(), "rate_hints", {"ratings": ratings})["results"]
+    assert results == [{"success": True}] + [{"success": False, "error": "Already voted"}] * 3
+    response = call_handler(load(), "rate_hint", rating("a", "h1", "upvote"))
+    assert response == {"success": False, "error": "Already voted"}
+    assert load().hint_store.rating("a", "h1") == {"upvotes": 1, "downvotes": 0}
+
+
+def test_ratings_with_fields_that_are_not_strings_are_malformed(load):
+    add_hints(load, {"a": ["h1"]})
+    ratings = [rating(["a"], "h1", "upvote"), rating("a", {"h": 1}, "report"), rating("a", "h1", None)]
+    response = call_handler(load(), "rate_hints", {"ratings": ratings})
+    assert response["results"] == [{"success": False, "error": "Malformed rating"}] * 3
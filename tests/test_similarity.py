@@ -0,0 +1,55 @@
+"""
+Tests of the detection of near-duplicate hints.
+"""
+from benchmarks.runtime import call_handler
+from crowdsourcehinter.similarity import find_similar_hint, normalize_hint
+
+from .test_crowdsourcehinter import add_hints
+
+
+def test_normalize_hint():
+    assert normalize_hint(u"  Check the SPELLING!! ") == u"check the spelling"
+    assert normalize_hint(u"don't\tstop") == u"don t stop"
+
+
+def test_the_same_normalized_text_is_found_at_any_threshold():
+    hints = [u"Check the spelling.", u"Count the letters."]
+    assert find_similar_hint(hints, u"check   the spelling", 1) == u"Check the spelling."
+    assert find_similar_hint(hints, u"check the spellings", 1) is None
+    assert find_similar_hint([], u"check the spelling", 1) is None
+
+
+def test_near_duplicates_are_found_above_the_threshold():
+    hints = [u"Remember to carry the one when adding.", u"Count the letters."]
+    assert find_similar_hint(hints, u"Remember to carry the one when you add.", 0.6) == hints[0]
+    assert find_similar_hint(hints, u"Remember to carry the one when you add.", 0.95) is None
+    assert find_similar_hint(hints, u"Check the units of your answer.", 0.6) is None
+
+
+def test_the_most_similar_hint_is_found():
+    hints = [u"Carry the one.", u"Remember to carry the one when adding."]
+    assert find_similar_hint(hints, u"Remember to carry the one when you add.", 0.3) == hints[1]
+
+
+def test_near_duplicate_submissions_are_folded_into_the_existing_hint(load):
+    add_hints(load, {"a": ["Remember to carry the one when adding."]})
+    submission = {"answer": "a", "new_hint_submission": "remember to carry the one when adding!"}
+    response = call_handler(load(duplicate_hint_similarity=0.8), "add_new_hint", submission)
+    assert response["hint"] == "Remember to carry the one when adding."
+    submission["new_hint_submission"] = "Check the units."
+    assert call_handler(load(duplicate_hint_similarity=0.8), "add_new_hint", submission)["result"] == "Hint added"
+    assert sorted(load().hint_store.ranked_hints("a")) == ["Check the units.", "Remember to carry the one when adding."]
+
+
+def test_reported_hints_are_not_upvoted_by_duplicates(load):
+    add_hints(load, {"a": ["Remove the p."]})
+    block = load()
+    block.hint_store.report("a", "Remove the p.")
+    block.save()
+    response = call_handler(load(), "add_new_hint", {"answer": "a", "new_hint_submission": "remove the p"})
+    assert response["result"] == "Hint added"
+    response = call_handler(load(), "add_new_hint", {"answer": "a", "new_hint_submission": "Remove the p."})
+    assert response["upvoted"] is False
+    store = load().hint_store
+    assert store.rating("a", "Remove the p.") == {"upvotes": 0, "downvotes": 0}
+    assert store.available_hint_count("a") == 1
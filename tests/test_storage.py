@@ -0,0 +1,396 @@
+"""
+Tests of the hint stores. Every test runs against both FieldHintStore and
+SQLiteHintStore, which must give the same results.
+"""
+import random
+
+import pytest
+
+from benchmarks.runtime import JsonKeyValueStore
+from crowdsourcehinter import storage
+from crowdsourcehinter.storage import FieldHintStore, SQLiteHintStore
+
+from .helpers import backend_settings, load_block, parse_block
+
+
+class FakeClock(object):
+    """
+    Stands in for the time module in storage.py.
+    """
+    now = 0.0
+
+    @classmethod
+    def time(cls):
+        return cls.now
+
+
+def snapshot(store):
+    """
+    Return everything a store holds, in a form that can be compared
+    across stores.
+    """
+    answers = sorted(store.answers())
+    return {
+        "hints": sorted(store.iter_hints()),
+        "ranked": dict((answer, store.ranked_hints(answer)) for answer in answers),
+        "best": dict((answer, store.best_hint(answer)) for answer in answers),
+        "available": store.available_hint_counts(answers + ["missing"]),
+        "reported": dict((answer, sorted(hints)) for answer, hints in store.reported_hints().items()),
+        "popular": store.popular_answers(len(answers)),
+    }
+
+
+def test_add_hint(load):
+    store = load().hint_store
+    assert store.add_hint("a", "h1") == []
+    store.add_hint("a", "h2")
+    store.add_hint("b", "h1")
+    assert sorted(store.answers()) == ["a", "b"]
+    assert store.has_hint("a", "h2")
+    assert not store.has_hint("b", "h2")
+    assert store.ranked_hints("a") == ["h1", "h2"]
+    assert store.rating("a", "h1") == {"upvotes": 0, "downvotes": 0}
+    assert store.available_hint_count("a") == 2
+    assert store.available_hint_count("c") == 0
+
+
+def test_vote(load):
+    store = load().hint_store
+    for hint in ("h1", "h2", "h3"):
+        store.add_hint("a", hint)
+    store.vote("a", "h2", "upvotes")
+    store.vote("a", "h2", "upvotes")
+    store.vote("a", "h1", "downvotes")
+    store.vote("a", "h3", "upvotes")
+    assert store.rating("a", "h2") == {"upvotes": 2, "downvotes": 0}
+    assert store.rating("a", "h1") == {"upvotes": 0, "downvotes": 1}
+    assert store.ranked_hints("a") == ["h2", "h3", "h1"]
+    assert store.best_hint("a") == "h2"
+    assert store.best_hint("a", skip=["h2"]) == "h3"
+
+
+def test_votes_are_kept_across_requests(load):
+    block = load()
+    block.hint_store.add_hint("a", "h1")
+    block.hint_store.add_hint("a", "h2")
+    block.save()
+    block = load()
+    block.hint_store.vote("a", "h2", "upvotes")
+    block.save()
+    store = load().hint_store
+    assert store.rating("a", "h2") == {"upvotes": 1, "downvotes": 0}
+    assert store.best_hint("a") == "h2"
+
+
+def test_report_and_unreport(load):
+    store = load().hint_store
+    store.add_hint("a", "h1")
+    store.add_hint("a", "h2")
+    store.add_hint("b", "h1")
+    assert store.report("a", "h1")
+    assert not store.report("a", "missing")
+    assert store.is_reported("a", "h1")
+    assert not store.is_reported("b", "h1")
+    assert store.reported_answers("h1") == ["a"]
+    assert store.reported_hints() == {"a": ["h1"]}
+    assert store.available_hint_count("a") == 1
+    assert store.available_hint_count("b") == 1
+    assert store.best_hint("a") == "h2"
+    assert store.best_hint("a", skip=["h2"]) is None
+    # reporting twice changes nothing
+    assert store.report("a", "h1")
+    assert store.available_hint_count("a") == 1
+    store.unreport("a", "h1")
+    assert not store.is_reported("a", "h1")
+    assert store.reported_hints() == {}
+    assert store.available_hint_count("a") == 2
+
+
+def test_remove_hint(load):
+    store = load().hint_store
+    store.add_hint("a", "h1")
+    store.add_hint("a", "h2")
+    store.report("a", "h2")
+    store.vote("a", "h1", "upvotes")
+    version = store.answers_version()
+    store.remove_hint("a", "h2")
+    assert not store.has_hint("a", "h2")
+    assert store.reported_hints() == {}
+    assert store.available_hint_count("a") == 1
+    assert store.answers_version() == version
+    store.remove_hint("a", "h1")
+    assert store.answers() == []
+    assert store.available_hint_count("a") == 0
+    assert store.answers_version() != version
+    # a hint added again starts without votes
+    store.add_hint("a", "h1")
+    assert store.rating("a", "h1") == {"upvotes": 0, "downvotes": 0}
+
+
+@pytest.mark.parametrize("policy, evicted", [("net_score", "h2"), ("oldest", "h1")])
+def test_evict(load, policy, evicted):
+    store = load(hint_limit=3, hint_eviction_policy=policy).hint_store
+    for hint in ("h1", "h2", "h3"):
+        store.add_hint("a", hint)
+    store.vote("a", "h1", "upvotes")
+    store.vote("a", "h2", "downvotes")
+    assert store.add_hint("a", "h4") == [evicted]
+    assert len(store.ranked_hints("a")) == 3
+    assert not store.has_hint("a", evicted)
+    assert store.available_hint_count("a") == 3
+
+
+def test_parse_xml_reads_the_eviction_policy():
+    assert parse_block(hint_eviction_policy="oldest").hint_eviction_policy == "oldest"
+    with pytest.raises(ValueError):
+        parse_block(hint_eviction_policy="newest")
+
+
+def test_a_new_hint_is_not_evicted_from_a_full_answer(load):
+    store = load(hint_limit=2).hint_store
+    for hint in ("h1", "h2"):
+        store.add_hint("a", hint)
+    store.vote("a", "h1", "upvotes")
+    store.vote("a", "h2", "upvotes")
+    store.vote("a", "h2", "upvotes")
+    assert store.add_hint("a", "h3") == ["h1"]
+    assert store.ranked_hints("a") == ["h2", "h3"]
+    # unless there is no room for it at all
+    store = load(hint_limit=0).hint_store
+    assert store.add_hint("b", "h1") == ["h1"]
+
+
+def test_import_hint(load):
+    store = load().hint_store
+    store.import_hint("a", "h1", 2, 1)
+    store.vote("a", "h1", "upvotes")
+    assert store.rating("a", "h1") == {"upvotes": 3, "downvotes": 1}
+    store.import_hint("a", "h1", 2, 4)
+    store.import_hint("a", "h1", 2, 4)
+    assert store.rating("a", "h1") == {"upvotes": 3, "downvotes": 4}
+    assert store.ranked_hints("a") == ["h1"]
+    assert store.popular_answers(1) == ["a"]
+
+
+def test_popular_answers(load):
+    store = load().hint_store
+    for answer in ("a", "b", "c"):
+        store.add_hint(answer, "h1")
+    store.add_hint("b", "h2")
+    store.vote("b", "h1", "upvotes")
+    store.vote("b", "h2", "downvotes")
+    store.vote("a", "h1", "upvotes")
+    assert store.popular_answers(5) == ["b", "a"]
+    assert store.popular_answers(1) == ["b"]
+    store.remove_hint("b", "h2")
+    assert store.popular_answers(5) == ["a", "b"]
+    store.remove_hint("a", "h1")
+    assert store.popular_answers(5) == ["b"]
+
+
+def test_unhinted_answers(load):
+    store = load().hint_store
+    store.unhinted_sample_rate = 1.0
+    for answer in ("x", "y", "x", "z", "x", "y"):
+        store.record_unhinted_answer(answer)
+    assert store.unhinted_answers()[:2] == [("x", 3), ("y", 2)]
+    store.add_hint("x", "h1")
+    assert "x" not in dict(store.unhinted_answers())
+
+
+def test_unhinted_answers_are_sampled(load, monkeypatch):
+    store = load().hint_store
+    store.unhinted_sample_rate = 0.25
+    draws = iter([0.1, 0.5, 0.2])
+    monkeypatch.setattr(storage.random, "random", lambda: next(draws))
+    for _draw in range(3):
+        store.record_unhinted_answer("x")
+    assert store.unhinted_answers() == [("x", 8)]
+
+
+def test_stores_give_the_same_results(tmp_path):
+    kvs = JsonKeyValueStore()
+    sqlite_settings = backend_settings("sqlite", tmp_path)
+    blocks = [load_block(kvs, {}, hint_limit=4), load_block(JsonKeyValueStore(), sqlite_settings, hint_limit=4)]
+    stores = [block.hint_store for block in blocks]
+    assert isinstance(stores[0], FieldHintStore)
+    assert isinstance(stores[1], SQLiteHintStore)
+    rng = random.Random(0)
+    answers = ["a", "b", "c"]
+    hints = ["h{}".format(index) for index in range(8)]
+    for step in range(400):
+        operation = rng.choice(("add", "add", "vote", "vote", "vote", "report", "unreport", "remove"))
+        answer, hint = rng.choice(answers), rng.choice(hints)
+        vote = rng.choice(("upvotes", "downvotes"))
+        results = []
+        for store in stores:
+            if operation == "add":
+                results.append(sorted(store.add_hint(answer, hint)))
+            elif operation == "vote":
+                if store.has_hint(answer, hint):
+                    store.vote(answer, hint, vote)
+                results.append(store.has_hint(answer, hint))
+            elif operation == "report":
+                results.append(store.report(answer, hint))
+            elif operation == "unreport":
+                results.append(store.unreport(answer, hint))
+            else:
+                results.append(store.remove_hint(answer, hint))
+        assert results[0] == results[1], (step, operation, answer, hint)
+        assert snapshot(stores[0]) == snapshot(stores[1]), (step, operation, answer, hint)
+
+
+def test_upgrade_from_baseline_format():
+    """
+    Blocks from before this package had storage versions kept hints keyed
+    by their text, and reported_hints as {hint: answer}, a report hiding
+    the hint for every answer.
+    """
+    kvs = JsonKeyValueStore()
+    block = load_block(kvs, {})
+    block.hint_database = {
+        "a": {"h1": {"upvotes": 2, "downvotes": 0}, "h2": {"upvotes": 0, "downvotes": 1}},
+        "b": {"h1": {"upvotes": 0, "downvotes": 3}, "h3": {"upvotes": 1, "downvotes": 0}},
+        "c": {},
+    }
+    block.reported_hints = {"h1": "b"}
+    block.save()
+    store = load_block(kvs, {}).hint_store
+    assert sorted(store.answers()) == ["a", "b"]
+    assert store.popular_answers(5) == ["b", "a"]
+    assert store.rating("a", "h1") == {"upvotes": 2, "downvotes": 0}
+    assert store.rating("b", "h1") == {"upvotes": 0, "downvotes": 3}
+    assert store.ranked_hints("a") == ["h1", "h2"]
+    assert store.is_reported("a", "h1")
+    assert store.is_reported("b", "h1")
+    assert store.available_hint_count("a") == 1
+    assert store.best_hint("a") == "h2"
+    assert store.best_hint("b") == "h3"
+    assert not store.has_hint("c", "h1")
+    store.vote("a", "h2", "upvotes")
+    store.add_hint("c", "h4")
+    store.block.save()
+    store = load_block(kvs, {}).hint_store
+    assert store.rating("a", "h2") == {"upvotes": 1, "downvotes": 1}
+    assert store.ranked_hints("c") == ["h4"]
+    store.unreport("b", "h1")
+    store.remove_hint("a", "h1")
+    assert store.best_hint("b") == "h3"
+    assert store.ranked_hints("b") == ["h3", "h1"]
+    assert store.reported_hints() == {}
+
+
+def report_hints(store, monkeypatch):
+    """
+    Report hints of two answers at increasing times, with different net
+    ratings, and return them as listed by reported_hints_page.
+    """
+    monkeypatch.setattr(storage, "time", FakeClock)
+    reported = []
+    for index in range(7):
+        answer = "a" if index % 3 else "b"
+        hint = "h{}".format(index)
+        store.add_hint(answer, hint)
+        for _vote in range(index % 4):
+            store.vote(answer, hint, "upvotes")
+        FakeClock.now = 1000.0 + index
+        assert store.report(answer, hint)
+        reported.append({"answer": answer, "hint": hint, "upvotes": index % 4, "downvotes": 0,
+                         "reported_at": FakeClock.now})
+    store.add_hint("a", "not reported")
+    return reported
+
+
+def all_pages(store, limit, **kwargs):
+    """
+    Return the items of every page of reported hints, and the number of
+    pages.
+    """
+    items, cursor, pages = [], None, 0
+    while True:
+        page, cursor = store.reported_hints_page(cursor=cursor, limit=limit, **kwargs)
+        assert len(page) <= limit
+        items.extend(page)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+@pytest.mark.parametrize("sort", storage.REPORT_SORTS)
+def test_reported_hints_pages(load, monkeypatch, sort):
+    store = load().hint_store
+    reported = report_hints(store, monkeypatch)
+    expected = sorted(reported, key=lambda item: storage.report_sort_key(item, sort))
+    for limit in (1, 3, 7, 20):
+        items, pages = all_pages(store, limit, sort=sort)
+        assert items == expected
+        assert pages == max(1, -(-len(expected) // limit))
+    items, _pages = all_pages(store, 2, sort=sort, answer="b")
+    assert items == [item for item in expected if item["answer"] == "b"]
+
+
+def test_reported_hints_pages_skip_moderated_hints(load, monkeypatch):
+    store = load().hint_store
+    reported = report_hints(store, monkeypatch)
+    page, cursor = store.reported_hints_page(limit=3)
+    assert page == reported[:3]
+    # hints moderated between two pages are not listed again or skipped
+    store.unreport(page[0]["answer"], page[0]["hint"])
+    store.remove_hint(reported[4]["answer"], reported[4]["hint"])
+    page, cursor = store.reported_hints_page(cursor=cursor, limit=3)
+    assert page == [reported[3], reported[5], reported[6]]
+    assert cursor is None
+
+
+def test_reported_hints_page_rejects_invalid_cursors(load):
+    store = load().hint_store
+    cursors = ("not a cursor", storage.encode_cursor([1, 2]), storage.encode_cursor(["x", 1, 2]),
+               storage.encode_cursor([True, "a", "h1"]))
+    for cursor in cursors:
+        with pytest.raises(ValueError):
+            store.reported_hints_page(cursor=cursor)
+
+
+def test_interleaved_requests_never_mix_up_hints():
+    """
+    Requests load the fields, change them and save the fields they
+    changed, overwriting what other requests saved in the meantime. Hints,
+    votes and reports may be lost that way, but a hint must never show up
+    for an answer it wasn't added to, and reading must not fail.
+    """
+    kvs = JsonKeyValueStore()
+    rng = random.Random(1)
+    answers = ["a", "b", "c"]
+    added = set()
+    pending = []
+    for step in range(600):
+        if pending and (len(pending) > 4 or rng.random() < 0.5):
+            pending.pop(rng.randrange(len(pending))).save()
+        block = load_block(kvs, {}, user_id="u{}".format(step), hint_limit=3)
+        store = block.hint_store
+        answer = rng.choice(answers)
+        hint = "{} hint {}".format(answer, rng.randrange(6))
+        operation = rng.choice(("add", "add", "vote", "report", "remove", "unreport"))
+        if operation == "add":
+            store.add_hint(answer, hint)
+            added.add((answer, hint))
+        elif operation == "vote" and store.has_hint(answer, hint):
+            store.vote(answer, hint, "upvotes")
+        elif operation == "report":
+            store.report(answer, hint)
+        elif operation == "remove":
+            store.remove_hint(answer, hint)
+        elif operation == "unreport":
+            store.unreport(answer, hint)
+        pending.append(block)
+
+        store = load_block(kvs, {}).hint_store
+        state = snapshot(store)
+        for hint_answer, hint_text, _rating, _reported in state["hints"]:
+            assert (hint_answer, hint_text) in added
+            assert hint_text.startswith(hint_answer)
+        for answer in answers:
+            unreported = [item for item in state["hints"] if item[0] == answer and not item[3]]
+            assert store.available_hint_count(answer) == len(unreported)
+            assert store.best_hint(answer) in [item[1] for item in unreported] + [None]
+        store.reported_hints_page()
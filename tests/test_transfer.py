@@ -0,0 +1,110 @@
+"""
+Tests of the export and import of hints as JSON Lines.
+"""
+import json
+
+from webob import Request
+
+from benchmarks.runtime import JsonKeyValueStore
+from crowdsourcehinter.transfer import export_lines, export_records, import_lines
+
+from .helpers import backend_settings, load_block
+from .test_crowdsourcehinter import add_hints
+
+
+def hint_records(block):
+    """
+    Return the hint records of an export of a block, in a stable order.
+    """
+    return sorted((record for record in export_records(block) if record["type"] == "hint"),
+                  key=lambda record: (record["answer"], record["hint"]))
+
+
+def make_source(load):
+    """
+    Fill a block with rated and reported hints, and return it.
+    """
+    add_hints(load, {"a": ["h1", "h2"], "[input 2] b": ["h3"]})
+    block = load(initial_hints={"a": ["h1"]}, generic_hints=["Check for typos."])
+    block.hint_store.vote("a", "h1", "upvotes")
+    block.hint_store.vote("a", "h1", "upvotes")
+    block.hint_store.vote("a", "h2", "downvotes")
+    block.hint_store.report("[input 2] b", "h3")
+    block.save()
+    return block
+
+
+def test_export_and_import_round_trip(load, tmp_path, request):
+    source = make_source(load)
+    lines = list(export_lines(source))
+    assert json.loads(lines[0].decode("utf8")) == {"type": "header", "format": 1}
+    backend = request.node.callspec.params["load"]
+    (tmp_path / "target").mkdir()
+    target = load_block(JsonKeyValueStore(), backend_settings(backend, tmp_path / "target"), "staff", True)
+    counts, errors = import_lines(target, lines, chunk_size=2)
+    assert errors == []
+    assert counts == {"header": 1, "hint": 3, "skipped": 2}
+    assert hint_records(target) == hint_records(source)
+    # initial and generic hints are content, only imported when asked for
+    assert target.initial_hints == {} and target.generic_hints == []
+
+
+def test_importing_twice_changes_nothing(load):
+    source = make_source(load)
+    lines = list(export_lines(source))
+    before = hint_records(source)
+    import_lines(source, lines)
+    import_lines(source, lines)
+    assert hint_records(source) == before
+
+
+def test_import_keeps_the_larger_vote_counts_of_existing_hints(load):
+    add_hints(load, {"a": ["h1"]})
+    block = load()
+    for _vote in range(5):
+        block.hint_store.vote("a", "h1", "upvotes")
+    line = json.dumps({"type": "hint", "answer": "a", "hint": "h1", "upvotes": 2, "downvotes": 1})
+    import_lines(block, [line])
+    assert block.hint_store.rating("a", "h1") == {"upvotes": 5, "downvotes": 1}
+    import_lines(block, [line])
+    assert block.hint_store.rating("a", "h1") == {"upvotes": 5, "downvotes": 1}
+    assert block.hint_store.popular_answers(1) == ["a"]
+
+
+def test_import_content_records_when_asked(load):
+    lines = [
+        json.dumps({"type": "initial_hints", "answer": "a", "hints": "h1"}),
+        json.dumps({"type": "generic_hint", "hint": "Check for typos."}),
+        json.dumps({"type": "generic_hint", "hint": "Check for typos."}),
+    ]
+    block = load()
+    counts, _errors = import_lines(block, lines, content=True)
+    assert counts == {"initial_hints": 1, "generic_hint": 2}
+    assert block.initial_hints == {"a": ["h1"]}
+    assert block.generic_hints == ["Check for typos."]
+    assert block.initial_hints_version == block.fingerprint_initial_hints({"a": ["h1"]})
+
+
+def test_import_skips_lines_it_cannot_import(load):
+    lines = [
+        "",
+        "not json",
+        json.dumps({"type": "hint", "answer": "a"}),
+        json.dumps({"type": "vote"}),
+        json.dumps({"type": "header", "format": 99}),
+        json.dumps({"type": "hint", "answer": "a", "hint": "h1"}),
+    ]
+    block = load()
+    counts, errors = import_lines(block, lines)
+    assert counts == {"hint": 1}
+    assert [error.split(":")[0] for error in errors] == ["2", "3", "4", "5"]
+    assert block.hint_store.rating("a", "h1") == {"upvotes": 0, "downvotes": 0}
+
+
+def test_import_hints_is_for_staff(load):
+    line = json.dumps({"type": "hint", "answer": "a", "hint": "h1"}).encode("utf8")
+    request = Request.blank("/", method="POST", body=line)
+    response = load().handle("import_hints", request)
+    assert response.status_code == 403
+    response = load(staff=True).handle("import_hints", Request.blank("/?content=1", method="POST", body=line))
+    assert json.loads(response.body.decode("utf8")) == {"success": True, "imported": {"hint": 1}, "errors": []}